@@ -1,108 +1,44 @@
-import datetime
-import re
-
-import lxml.etree
-import requests
-
-EVENT_ID_PATTERN = re.compile(r"https?:\/\/(?:www\.)?ra.co\/events\/(\d+)")
-USER_AGENT = (
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 "
-    "(KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"
-)
-
-
-def make_request(url):
-    headers = {'User-Agent': USER_AGENT}
-    return requests.get(url, timeout=10, headers=headers)
-
-
-def extract_event_id(url):
-    return EVENT_ID_PATTERN.search(url)[1]
-
-
-def extract_title(dom):
-    return dom.xpath('//h1//text()')[0]
-
-
-def extract_date(dom):
-    extracted = dom.xpath("//span[text() = 'Date']/../..//a//text()")
-    extracted = extracted[0].strip()
-    extracted = extracted.rsplit(', ', maxsplit=1)[-1]
-    return datetime.datetime.strptime(extracted, '%d %b %Y').date()
-
-
-def extract_tickets(dom):
-    tickets = dom.xpath("//li[@id='ticket-types']/ul/li")
-    for ticket in tickets:
-        yield {
-            'title': extract_ticket_title(ticket),
-            'price': extract_price(ticket),
-            'available': extract_availability(ticket)
-        }
-
-
-def extract_ticket_title(element):
-    path = [
-        './/div[@class="pr8"]/text()',
-        './/div[@class="type-title"]/text()'
-    ]
-    return element.xpath('|'.join(path))[0]
-
-
-def extract_price(element):
-    return element.xpath('.//div[@class="type-price"]/text()')[0]
-
-
-def extract_availability(element):
-    mapping = {'closed': False, 'onsale but': True}
-    availability = element.xpath('./@class')[0]
-    return mapping.get(availability, False)
-
-
-def is_resale_active(tickets):
-    return not any(ticket['available'] for ticket in tickets)
-
-
-def parse_tickets(html):
-    try:
-        dom = lxml.etree.HTML(html)
-        tickets = list(extract_tickets(dom))
-    except IndexError:
-        raise ExtractionError()
-    return tickets
-
-
-def parse_event(html):
-    try:
-        dom = lxml.etree.HTML(html)
-        title = extract_title(dom)
-        date = extract_date(dom)
-    except IndexError:
-        raise ExtractionError()
-    return {
-        'title': title,
-        'date': date
-    }
-
-
-def get_tickets(url):
-    event_id = extract_event_id(url)
-    ticket_url = f"https://ra.co/widget/event/{event_id}/embedtickets"
-    html = make_request(ticket_url)
-    return parse_tickets(html.text)
-
-
-def get_event(url):
-    html = make_request(url)
-    return parse_event(html.text)
-
-
-def get_page(url):
-    event = get_event(url)
-    tickets = get_tickets(url)
-    event['tickets'] = tickets
-    event['resale_active'] = is_resale_active(tickets)
-    return event
+"""
+Alerts for tickets released on RA resale.
+
+The scraper in `alerts.scraper` needs lxml and requests, which are slow to
+import, so it is loaded the first time one of its names is used from this
+package rather than when Django starts. Pages that never scrape do not pay
+for it. Call `warmup` to load it ahead of the first scrape.
+"""
+import importlib
+
+# Names importable from this package that are defined by `alerts.scraper`.
+SCRAPER_NAMES = frozenset([
+    'AVAILABILITY', 'AVAILABILITY_XPATH', 'DATE_XPATH', 'EVENT_ID_PATTERN',
+    'NEXT_DATA_ID', 'PRICE_XPATH', 'TICKETS_XPATH', 'TICKET_TITLE_XPATH',
+    'TITLE_XPATH', 'EventInfo', 'Page', 'TicketInfo',
+    'extract_availability', 'extract_date', 'extract_embedded_event',
+    'extract_event_id', 'extract_price', 'extract_ticket_title',
+    'extract_tickets', 'extract_title', 'fetch_tickets', 'find_embedded_data',
+    'get_event', 'get_page', 'get_ticket_url', 'get_tickets',
+    'is_resale_active', 'make_request', 'parse_event', 'parse_event_html',
+    'parse_html', 'parse_tickets',
+])
+
+
+def __getattr__(name):
+    if name in SCRAPER_NAMES:
+        scraper = importlib.import_module('.scraper', __name__)
+        return getattr(scraper, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | SCRAPER_NAMES)
+
+
+def warmup():
+    """
+    Load the scraper and set up the session to RA before they are needed.
+    """
+    scraper = importlib.import_module('.scraper', __name__)
+    scraper.client.get_session()
 
 
 class ExtractionError(Exception):
@@ -1,8 +1,100 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from .models import Event, Ticket, Tracker
 
+# Rows counted at most when paginating a changelist.
+COUNT_LIMIT = 10000
 
-admin.site.register(Event)
-admin.site.register(Ticket)
-admin.site.register(Tracker)
\ No newline at end of file
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts every row of a large table.
+
+    An unfiltered PostgreSQL table is sized from the planner's estimate.
+    Otherwise rows are counted up to `COUNT_LIMIT`, so that later pages of
+    a bigger list are reached by filtering or searching instead.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            # Tables that have never been analysed have no estimate.
+            if row and row[0] > COUNT_LIMIT:
+                return int(row[0])
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist that avoids full table counts and queries per row.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
+    raw_id_fields = ('event',)
+    list_select_related = ('event',)
+
+
+@admin.register(Event)
+class EventAdmin(admin.ModelAdmin):
+    list_display = ('title', 'date', 'url', 'resale_active', 'next_poll')
+    list_filter = ('date',)
+    search_fields = ('url__exact',)
+    ordering = ('-date',)
+
+
+@admin.register(Ticket)
+class TicketAdmin(LargeTableAdmin):
+    list_display = ('title', 'price', 'event', 'available', 'ignore')
+    list_filter = ('available', 'ignore')
+    search_fields = ('event__url__exact',)
+    actions = ('ignore_tickets', 'unignore_tickets')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        Event.objects.filter(id=obj.event_id).clear_ticket_validators()
+
+    def ignore_tickets(self, request, queryset):
+        updated = queryset.update(ignore=True)
+        self.message_user(request, f"{updated} tickets ignored.")
+    ignore_tickets.short_description = "Ignore selected tickets"
+
+    def unignore_tickets(self, request, queryset):
+        updated = queryset.update(ignore=False)
+        # Ignored tickets are not updated by polls, so their events are
+        # polled in full again to bring them up to date.
+        Event.objects.filter(
+            id__in=queryset.values('event')
+        ).clear_ticket_validators()
+        self.message_user(request, f"{updated} tickets no longer ignored.")
+    unignore_tickets.short_description = "Stop ignoring selected tickets"
+
+
+@admin.register(Tracker)
+class TrackerAdmin(LargeTableAdmin):
+    list_display = ('email', 'event', 'sent', 'datetime')
+    list_filter = ('sent',)
+    search_fields = ('email__exact',)
+    actions = ('reset_sent',)
+
+    def reset_sent(self, request, queryset):
+        # As in `update_tracker`, trackers are armed again so that they are
+        # alerted if tickets are already available.
+        updated = queryset.update(
+            sent=False, subscribed=timezone.now(), failures=0
+        )
+        self.message_user(
+            request, f"{updated} trackers will be alerted on the next release."
+        )
+    reset_sent.short_description = "Alert selected trackers again"
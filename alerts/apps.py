@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AlertsConfig(AppConfig):
     name = 'alerts'
+
+    def ready(self):
+        if settings.SCRAPER_WARMUP:
+            from . import warmup
+            warmup()
@@ -0,0 +1,77 @@
+"""
+Cache of scraped event pages shared between threads and processes.
+
+Pages are keyed by RA event id so that differently written urls for the same
+event share an entry. Concurrent misses for the same event are coalesced so
+that only one fetch is in flight: within a process by a per-event lock and
+across processes by a lock entry in the cache itself. Size and expiry are
+bounded by the `pages` cache configured in settings, which must be a shared
+backend such as memcached or the database cache for coalescing to work
+across gunicorn workers.
+"""
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import extract_event_id, get_page
+
+# Seconds between checks for a page being fetched by another process.
+POLL_INTERVAL = 0.1
+
+_locks = weakref.WeakValueDictionary()
+_locks_lock = threading.Lock()
+
+
+def _event_lock(event_id):
+    with _locks_lock:
+        lock = _locks.get(event_id)
+        if lock is None:
+            lock = _locks[event_id] = threading.Lock()
+        return lock
+
+
+def get_cached_page(url):
+    """
+    Scrape `url` unless the same RA event was scraped within
+    `PAGE_CACHE_TTL` seconds, waiting for any fetch of it already in flight.
+    Errors are not cached.
+    """
+    cache = caches['pages']
+    key = f'page:{extract_event_id(url)}'
+
+    page = cache.get(key)
+    if page is not None:
+        return page
+
+    with _event_lock(key):
+        page = cache.get(key)
+        if page is not None:
+            return page
+        return _fetch_once(cache, key, url)
+
+
+def _fetch_once(cache, key, url):
+    lock_key = f'{key}:lock'
+    timeout = settings.PAGE_CACHE_LOCK_TIMEOUT
+    deadline = time.monotonic() + timeout
+
+    locked = cache.add(lock_key, True, timeout)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        page = cache.get(key)
+        if page is not None:
+            return page
+        locked = cache.add(lock_key, True, timeout)
+
+    # If the other process has not finished by the deadline the page is
+    # fetched anyway rather than waiting on a lock that may have been lost.
+    try:
+        page = get_page(url)
+        cache.set(key, page, settings.PAGE_CACHE_TTL)
+        return page
+    finally:
+        if locked:
+            cache.delete(lock_key)
@@ -0,0 +1,381 @@
+"""
+Shared HTTP session for requests made to RA.
+
+A single `requests.Session` is created lazily and reused by every thread so
+that connections to ra.co are pooled and kept alive between requests instead
+of paying for a new TCP and TLS handshake on each fetch. The underlying
+urllib3 connection pool is thread-safe.
+
+Every request also passes through a shared `RateLimiter` so that the
+scraper runs just under the rate RA tolerates rather than bursting and
+being throttled, and a `CircuitBreaker` so that requests fail fast while RA
+is down instead of each waiting out its timeout. Responses can be recorded
+and replayed by setting `RA_TRANSPORT`, see `alerts.transport`.
+"""
+import collections
+import email.utils
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+from . import metrics, transport
+
+TIMEOUT = 10
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"
+)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Longest Retry-After that is honoured, in seconds.
+MAX_RETRY_AFTER = 60
+
+_session = None
+_limiter = None
+_breaker = None
+_session_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Token bucket for outbound requests with a cap on concurrent requests.
+
+    The rate adapts to RA: it is halved whenever a request is throttled and
+    recovers additively, by about one request per second each second, on
+    success. A Retry-After pauses every request until it has passed.
+    """
+    def __init__(self, rate, min_rate, burst, concurrency):
+        self.rate = self.max_rate = rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.slots.acquire()
+        try:
+            while True:
+                wait = self._take()
+                if not wait:
+                    return self
+                time.sleep(wait)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def __exit__(self, *exc_info):
+        self.slots.release()
+
+    def _take(self):
+        """
+        Take a token, or return the number of seconds to wait for one.
+        """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self.updated
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+            rate = self.rate
+        if metrics.enabled():
+            metrics.set_gauge('ra_request_rate', rate)
+
+    def throttled(self, status, retry_after=0):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+            if retry_after:
+                self.blocked_until = max(
+                    self.blocked_until, time.monotonic() + retry_after
+                )
+            rate = self.rate
+        if metrics.enabled():
+            metrics.set_gauge('ra_request_rate', rate)
+            metrics.increment('ra_throttled_total', status=status)
+
+
+class CircuitBreaker:
+    """
+    Stop requests to RA while most recent requests have failed.
+
+    Requests that raise, return a server error or are throttled, or take
+    longer than `slow` seconds count as failures. Once at least `volume`
+    requests have been made in the last `window` seconds and the fraction
+    that failed reaches `threshold` the circuit opens and requests raise
+    `CircuitOpenError` without being made. After `cooldown` seconds the
+    circuit is half open and a single probe request is let through: the
+    circuit closes if it succeeds and opens again if it fails.
+    """
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+    STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, threshold, volume, window, slow, cooldown):
+        self.threshold = threshold
+        self.volume = volume
+        self.window = window
+        self.slow = slow
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened = 0
+        self.probing = False
+        self.results = collections.deque()
+        self._lock = threading.Lock()
+
+    def current_state(self):
+        with self._lock:
+            if (self.state == self.OPEN and
+                    time.monotonic() - self.opened >= self.cooldown):
+                return self.HALF_OPEN
+            return self.state
+
+    def before(self):
+        """
+        Raise `CircuitOpenError` unless a request may be made. Returns
+        whether the request is a probe of a half open circuit.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if (self.state == self.OPEN and
+                    time.monotonic() - self.opened >= self.cooldown):
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+        raise CircuitOpenError('RA circuit is open.')
+
+    def record(self, probe, failed, elapsed):
+        failed = failed or elapsed > self.slow
+        with self._lock:
+            if probe:
+                self.probing = False
+                self.results.clear()
+                if failed:
+                    self._trip()
+                else:
+                    self._set_state(self.CLOSED)
+                return
+            if self.state != self.CLOSED:
+                return
+
+            now = time.monotonic()
+            self.results.append((now, failed))
+            while self.results and now - self.results[0][0] > self.window:
+                self.results.popleft()
+            failures = sum(failed for _, failed in self.results)
+            if (len(self.results) >= self.volume and
+                    failures >= self.threshold * len(self.results)):
+                self.results.clear()
+                self._trip()
+
+    def _trip(self):
+        self.opened = time.monotonic()
+        self._set_state(self.OPEN)
+        print("RA circuit opened.")
+        if metrics.enabled():
+            metrics.increment('ra_circuit_trips_total')
+
+    def _set_state(self, state):
+        self.state = state
+        if metrics.enabled():
+            metrics.set_gauge('ra_circuit_state', self.STATES[state])
+
+
+def parse_retry_after(response):
+    """
+    Seconds to wait given by a Retry-After header, either as a number of
+    seconds or as an HTTP date.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return 0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return 0
+        seconds = date.timestamp() - time.time()
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+def create_session(pool_size, retries, backoff):
+    # Statuses are retried by `get` so that retries go through the limiter.
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    adapter = create_adapter(pool_size, retry)
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def create_adapter(pool_size, retry):
+    if settings.RA_TRANSPORT == 'replay':
+        return transport.ReplayAdapter(
+            settings.RA_ARCHIVE,
+            speed=settings.RA_REPLAY_SPEED,
+            concurrency=settings.RA_REPLAY_CONCURRENCY,
+        )
+    options = {
+        'pool_connections': 4, 'pool_maxsize': pool_size, 'max_retries': retry
+    }
+    if settings.RA_TRANSPORT == 'record':
+        return transport.RecordingAdapter(settings.RA_ARCHIVE, **options)
+    return HTTPAdapter(**options)
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session(
+                    pool_size=settings.RA_POOL_SIZE,
+                    retries=settings.RA_RETRIES,
+                    backoff=settings.RA_RETRY_BACKOFF,
+                )
+    return _session
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _session_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(
+                    rate=settings.RA_RATE,
+                    min_rate=settings.RA_MIN_RATE,
+                    burst=settings.RA_BURST,
+                    concurrency=settings.RA_CONCURRENCY,
+                )
+    return _limiter
+
+
+def get_breaker():
+    global _breaker
+    if _breaker is None:
+        with _session_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    threshold=settings.RA_BREAKER_THRESHOLD,
+                    volume=settings.RA_BREAKER_VOLUME,
+                    window=settings.RA_BREAKER_WINDOW,
+                    slow=settings.RA_BREAKER_SLOW,
+                    cooldown=settings.RA_BREAKER_COOLDOWN,
+                )
+    return _breaker
+
+
+def circuit_state():
+    return get_breaker().current_state()
+
+
+def circuit_open():
+    """
+    Whether requests to RA are currently failing fast.
+    """
+    return circuit_state() == CircuitBreaker.OPEN
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def send(session, url, headers):
+    """
+    Make a single request to RA, recording its latency and any error. Time
+    spent waiting on the limiter is not included.
+    """
+    start = time.perf_counter()
+    try:
+        return session.get(url, timeout=TIMEOUT, headers=headers)
+    except Exception as e:
+        metrics.record_error('request', e)
+        raise
+    finally:
+        if metrics.enabled():
+            metrics.observe('ra_request_seconds', time.perf_counter() - start)
+
+
+def get(url, headers=None):
+    """
+    GET `url` from RA within the rate limit.
+
+    Throttled and server error responses are retried up to `RA_RETRIES`
+    times. Throttling slows the limiter for every caller and waits for
+    Retry-After if given, or an exponential backoff otherwise. Raises
+    `ResponseError` if every attempt failed, and `CircuitOpenError` without
+    making a request while RA is down.
+    """
+    session = get_session()
+    limiter = get_limiter()
+    breaker = get_breaker()
+    for attempt in range(settings.RA_RETRIES + 1):
+        try:
+            probe = breaker.before()
+        except CircuitOpenError as e:
+            metrics.record_error('request', e)
+            raise
+        with limiter:
+            # The clock starts once the limiter lets the request through, so
+            # that waiting for it does not count as RA being slow.
+            start = time.monotonic()
+            try:
+                response = send(session, url, headers)
+            except Exception:
+                breaker.record(probe, True, time.monotonic() - start)
+                raise
+            elapsed = time.monotonic() - start
+        failed = response.status_code in RETRY_STATUSES
+        breaker.record(probe, failed, elapsed)
+        if not failed:
+            limiter.succeeded()
+            return response
+        retry_after = parse_retry_after(response) or (
+            settings.RA_RETRY_BACKOFF * 2 ** attempt
+        )
+        limiter.throttled(response.status_code, retry_after)
+    error = ResponseError(
+        f"RA responded {response.status_code} to {url}.", response=response
+    )
+    metrics.record_error('request', error)
+    raise error
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class ResponseError(requests.exceptions.ConnectionError):
+    """
+    RA responded with an error. Like a failed connection, the request can be
+    retried later.
+    """
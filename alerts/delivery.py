@@ -0,0 +1,155 @@
+"""
+Batched delivery of alert emails over persistent SMTP connections.
+
+Opening an SMTP session with STARTTLS is far slower than sending a message
+over one that is already open, so messages are split into batches and each
+batch is sent over a single connection. Batches are sent concurrently by a
+small pool of senders.
+
+Long-running workers can call `open_connections` to keep the senders'
+connections open between calls to `deliver` instead of opening them for
+each batch.
+"""
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from smtplib import SMTPException, SMTPServerDisconnected
+
+from django.conf import settings
+from django.core import mail
+
+from . import metrics
+
+_connections = None
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def send_batch(messages, connection=None, keep_open=False):
+    """
+    Send `messages` over one SMTP connection.
+
+    Messages are sent one at a time over the open connection so that a
+    failure is recorded against its own recipient. The connection is closed
+    afterwards unless it was already open or `keep_open` is set. Returns a
+    list of `(message, error)` pairs where `error` is None if the message
+    was sent.
+    """
+    if connection is None:
+        connection = mail.get_connection(fail_silently=False)
+    if keep_open:
+        check_connection(connection)
+
+    try:
+        opened = connection.open()
+    except (SMTPException, OSError) as e:
+        metrics.record_error('send', e)
+        return [(message, e) for message in messages]
+
+    results = []
+    try:
+        for message in messages:
+            error = send_message(connection, message)
+            if error is not None:
+                metrics.record_error('send', error)
+            results.append((message, error))
+    finally:
+        if opened and not keep_open:
+            connection.close()
+    return results
+
+
+def check_connection(connection):
+    """
+    Close `connection` if the server has dropped it so that it reconnects.
+    """
+    smtp = getattr(connection, 'connection', None)
+    if smtp is None:
+        return
+    try:
+        smtp.noop()
+    except (SMTPException, OSError):
+        close_connection(connection)
+
+
+def close_connection(connection):
+    try:
+        connection.close()
+    except (SMTPException, OSError):
+        pass
+
+
+def send_message(connection, message):
+    """
+    Send `message` over an open connection. Returns the error raised, if any.
+    """
+    start = time.perf_counter()
+    try:
+        connection.send_messages([message])
+    except SMTPServerDisconnected as e:
+        # Drop the dead connection so the next message reconnects.
+        connection.close()
+        return e
+    except (SMTPException, OSError) as e:
+        return e
+    finally:
+        if metrics.enabled():
+            metrics.observe(
+                'smtp_send_seconds', time.perf_counter() - start
+            )
+    return None
+
+
+def deliver(messages, batch_size=None, senders=None):
+    """
+    Send `messages` in batches across a pool of SMTP connections.
+
+    Returns `(message, error)` pairs in the same order as `messages`.
+    """
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    senders = senders or settings.EMAIL_SENDERS
+    batches = list(batched(list(messages), batch_size))
+    if not batches:
+        return []
+
+    send = send_batch
+    if _connections is not None:
+        send = send_pooled
+        senders = _connections.qsize()
+
+    with ThreadPoolExecutor(max_workers=min(senders, len(batches))) as pool:
+        results = pool.map(send, batches)
+    return [result for batch in results for result in batch]
+
+
+def send_pooled(messages):
+    # There are never more senders than connections so one is always free.
+    connection = _connections.get()
+    try:
+        return send_batch(messages, connection, keep_open=True)
+    finally:
+        _connections.put(connection)
+
+
+def open_connections(senders=None):
+    """
+    Keep `senders` SMTP connections open for every `deliver` until
+    `close_connections` is called. Connections are opened on first use and
+    reopened if the server drops them.
+    """
+    global _connections
+    senders = senders or settings.EMAIL_SENDERS
+    connections = queue.Queue()
+    for _ in range(senders):
+        connections.put(mail.get_connection(fail_silently=False))
+    _connections = connections
+
+
+def close_connections():
+    global _connections
+    connections, _connections = _connections, None
+    while connections is not None and not connections.empty():
+        close_connection(connections.get())
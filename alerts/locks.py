@@ -0,0 +1,45 @@
+"""
+Locks that let a single process at a time run a stage of the pipeline.
+
+Processing submissions, sending alerts and pruning read rows that nothing
+claims first, so two workers, or a worker and a cron request, running the
+same stage at once would both email the same people. Each of these stages
+runs under an exclusive lock and is skipped by any other process that finds
+it held.
+
+On PostgreSQL these are session-level advisory locks, which are released
+when the stage finishes or its database connection is lost. Other databases
+are only used for development with a single process, so the lock is always
+taken.
+"""
+import contextlib
+import zlib
+
+from django.db import connection
+
+
+def lock_id(name):
+    return zlib.crc32(f'alerts:{name}'.encode('utf-8'))
+
+
+@contextlib.contextmanager
+def exclusive(name):
+    """
+    Try to take the lock `name` without waiting. Yields whether it was
+    taken, and releases it on exit.
+    """
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock_id(name)])
+        locked = cursor.fetchone()[0]
+    try:
+        yield locked
+    finally:
+        if locked:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_unlock(%s)', [lock_id(name)]
+                )
@@ -0,0 +1,188 @@
+import collections
+import json
+import signal
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from alerts import client, delivery, metrics
+from alerts.views import (
+    pending_submissions, poll_due, process_submissions, prune_expired,
+    send_alerts
+)
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """
+    Respond 200 while the worker is completing runs and 503 otherwise.
+    """
+    def do_GET(self):
+        healthy, status = self.server.command.health()
+        body = json.dumps(status).encode('utf-8')
+        self.send_response(200 if healthy else 503)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Process submissions, poll RA, send alerts and prune expired events "
+        "in a loop until stopped with SIGTERM or SIGINT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shard', type=int, default=0,
+            help="Shard of the events to poll, from 0."
+        )
+        parser.add_argument(
+            '--shards', type=int, default=1,
+            help="Number of workers the events are split between."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=settings.WORKER_INTERVAL,
+            help="Seconds to wait between runs."
+        )
+        parser.add_argument(
+            '--prune-interval', type=float,
+            default=settings.WORKER_PRUNE_INTERVAL,
+            help="Seconds to wait between prunes of expired events."
+        )
+        parser.add_argument(
+            '--health-port', type=int,
+            help="Serve a health check on this port."
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit after a single run."
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['shard'] < options['shards']:
+            raise CommandError('Invalid shard.')
+
+        self.stopping = threading.Event()
+        self.started = time.time()
+        self.last_run = None
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        server = None
+        if options['health_port'] is not None:
+            server = self.serve_health(options['health_port'])
+
+        # Connections to RA and the SMTP server, and the page cache, are
+        # kept between runs rather than set up again for each one.
+        delivery.open_connections()
+        last_prune = None
+        try:
+            while not self.stopping.is_set():
+                prune = (
+                    last_prune is None or
+                    time.time() - last_prune >= options['prune_interval']
+                )
+                polled = self.run(options['shard'], options['shards'], prune)
+                if prune and polled is not None:
+                    last_prune = time.time()
+                if options['once']:
+                    break
+                # Go again straight away if the poll budget was used up as
+                # more events are likely due.
+                if polled is None or polled < settings.POLL_BUDGET:
+                    self.stopping.wait(options['interval'])
+        finally:
+            delivery.close_connections()
+            client.close_session()
+            close_old_connections()
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        self.stdout.write("Stopped.")
+
+    def run(self, shard, shards, prune):
+        """
+        Do one run of the pipeline. Returns the number of events polled, or
+        None if the run failed.
+        """
+        # Outside of a request Django does not recycle database connections,
+        # so drop any that have gone stale since the last run.
+        close_old_connections()
+        try:
+            submitted, polled = {}, collections.Counter()
+            # Submissions and polls are left for a later run while RA is
+            # down, but alerts for tickets already found are still sent.
+            if client.circuit_open():
+                self.stderr.write("RA is unavailable.")
+            else:
+                submitted = process_submissions(pending_submissions())
+                polled.update(
+                    outcome for outcome, _ in poll_due(shard, shards)
+                )
+            sent = collections.Counter(
+                outcome for outcome, _ in send_alerts()
+            )
+            pruned = prune_expired() if prune else {}
+        except Exception as e:
+            metrics.record_error('worker', e)
+            self.stderr.write(traceback.format_exc())
+            return None
+
+        self.last_run = time.time()
+        if metrics.enabled():
+            metrics.set_gauge('worker_last_run', self.last_run)
+        submitted = {
+            outcome: len(submissions)
+            for outcome, submissions in submitted.items()
+        }
+        self.stdout.write(
+            f"Submissions {format_counts(submitted)}. "
+            f"Polled {format_counts(polled)}. "
+            f"Alerts {format_counts(sent)}. "
+            f"Pruned {format_counts(pruned)}."
+        )
+        return sum(polled.values())
+
+    def stop(self, signum, frame):
+        self.stdout.write("Stopping after the current run.")
+        self.stopping.set()
+
+    def health(self):
+        """
+        Whether a run has completed within `WORKER_HEALTH_TIMEOUT` seconds,
+        allowing the first run as long from startup.
+        """
+        since = self.last_run or self.started
+        healthy = (
+            not self.stopping.is_set() and
+            time.time() - since < settings.WORKER_HEALTH_TIMEOUT
+        )
+        return healthy, {
+            'healthy': healthy,
+            'stopping': self.stopping.is_set(),
+            'last_run': self.last_run,
+            'circuit': client.circuit_state(),
+        }
+
+    def serve_health(self, port):
+        server = ThreadingHTTPServer(('', port), HealthHandler)
+        server.daemon_threads = True
+        server.command = self
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
+
+
+def format_counts(counts):
+    return ', '.join(
+        f"{count} {outcome}" for outcome, count in counts.items()
+    ) or 'none'
@@ -0,0 +1,32 @@
+import requests
+
+from django.core.management.base import BaseCommand
+
+from alerts import ExtractionError
+from alerts.models import Event
+from alerts.views import refresh_event
+
+
+class Command(BaseCommand):
+    help = "Refresh the title and date of tracked events from their RA pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'ids', nargs='*', type=int,
+            help="Event ids to refresh. Defaults to all events."
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options['ids']:
+            events = events.filter(id__in=options['ids'])
+
+        for event in events:
+            try:
+                refresh_event(event)
+            except (requests.exceptions.Timeout,
+                    requests.exceptions.ConnectionError,
+                    ExtractionError):
+                self.stderr.write(f"Error refreshing {event.title}")
+                continue
+            self.stdout.write(f"Refreshed {event.title}")
@@ -0,0 +1,221 @@
+"""
+In-process metrics for the scraping and alerting pipeline.
+
+Latency histograms, error counters and gauges are kept in memory per process
+and exported in the Prometheus text format by the `metrics` view. Nothing is
+recorded unless `METRICS_ENABLED` is set, in which case the instrumented
+functions only pay for a settings lookup.
+"""
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+PREFIX = 'resale_'
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+HISTOGRAMS = {
+    'ra_request_seconds': ("Latency of requests to RA.", LATENCY_BUCKETS),
+    'parse_seconds': ("Time to parse an RA document.", LATENCY_BUCKETS),
+    'update_tickets_seconds': (
+        "Time to sync the tickets of an event.", LATENCY_BUCKETS
+    ),
+    'smtp_send_seconds': ("Time to send one email.", LATENCY_BUCKETS),
+    'prune_seconds': ("Time to prune expired events.", LATENCY_BUCKETS),
+    'db_queries': ("Database queries per request.", COUNT_BUCKETS),
+}
+COUNTERS = {
+    'errors_total': "Errors by stage and type.",
+    'ra_throttled_total': "Requests to RA throttled or failed by status.",
+    'ra_circuit_trips_total': "Times the RA circuit breaker has opened.",
+    'parse_fallbacks_total': "Pages parsed from HTML without embedded data.",
+}
+GAUGES = {
+    'ra_request_rate': "Current limit on requests to RA per second.",
+    'ra_circuit_state': "RA circuit breaker: 0 closed, 1 half open, 2 open.",
+    'worker_last_run': "Unix time the poll worker last completed a run.",
+}
+
+# Exceptions are classified by name so that this module does not need to
+# import requests or the scraper.
+ERROR_TYPES = {
+    'CircuitOpenError': 'circuit_open',
+    'ResponseError': 'response',
+    'Timeout': 'timeout',
+    'ExtractionError': 'extraction',
+    'SMTPException': 'smtp',
+    'ConnectionError': 'connection',
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+
+
+def enabled():
+    return settings.METRICS_ENABLED
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    buckets = HISTOGRAMS[name][1]
+    key = _key(name, labels)
+    with _lock:
+        counts, total, n = _histograms.get(key, ([0] * len(buckets), 0.0, 0))
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                counts[i] += 1
+        _histograms[key] = counts, total + value, n + 1
+
+
+def increment(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def error_type(exc):
+    for cls in type(exc).__mro__:
+        if cls.__name__ in ERROR_TYPES:
+            return ERROR_TYPES[cls.__name__]
+    return type(exc).__name__
+
+
+def record_error(stage, exc):
+    if enabled():
+        increment('errors_total', stage=stage, type=error_type(exc))
+
+
+def timed(name, stage, **labels):
+    """
+    Record the duration of each call in histogram `name` and count any
+    exception raised as an error of `stage`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wraps(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                record_error(stage, e)
+                raise
+            finally:
+                observe(name, time.perf_counter() - start, **labels)
+        return wraps
+    return decorator
+
+
+class QueryCountMiddleware:
+    """
+    Record the number of database queries made by each request.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.url_name if match else 'unknown'
+        if response.streaming:
+            # The queries of a streaming response run as it is sent, after
+            # the view has returned, so they are counted until it closes.
+            response.streaming_content = self.stream(
+                response.streaming_content, count, queries, view
+            )
+        else:
+            observe('db_queries', queries[0], view=view)
+        return response
+
+    def stream(self, content, count, queries, view):
+        try:
+            with connection.execute_wrapper(count):
+                yield from content
+        finally:
+            observe('db_queries', queries[0], view=view)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+def _format_labels(labels, **extra):
+    labels = list(labels) + list(extra.items())
+    if not labels:
+        return ''
+    inner = ','.join(f'{name}="{value}"' for name, value in labels)
+    return '{' + inner + '}'
+
+
+def render():
+    """
+    Export all recorded metrics in the Prometheus text format.
+    """
+    with _lock:
+        histograms = {
+            key: (list(counts), total, n)
+            for key, (counts, total, n) in _histograms.items()
+        }
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        series = [(k, v) for k, v in histograms.items() if k[0] == name]
+        if not series:
+            continue
+        lines.append(f'# HELP {PREFIX}{name} {description}')
+        lines.append(f'# TYPE {PREFIX}{name} histogram')
+        for (_, labels), (counts, total, n) in sorted(series):
+            for bound, count in zip(buckets, counts):
+                lines.append(f'{PREFIX}{name}_bucket'
+                             f'{_format_labels(labels, le=bound)} {count}')
+            lines.append(f'{PREFIX}{name}_bucket'
+                         f'{_format_labels(labels, le="+Inf")} {n}')
+            lines.append(f'{PREFIX}{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{PREFIX}{name}_count{_format_labels(labels)} {n}')
+
+    for kind, described, values in (
+        ('counter', COUNTERS, counters),
+        ('gauge', GAUGES, gauges),
+    ):
+        for name, description in described.items():
+            series = [(k, v) for k, v in values.items() if k[0] == name]
+            if not series:
+                continue
+            lines.append(f'# HELP {PREFIX}{name} {description}')
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+            for (_, labels), value in sorted(series):
+                lines.append(f'{PREFIX}{name}{_format_labels(labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
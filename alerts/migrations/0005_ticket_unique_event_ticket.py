@@ -0,0 +1,48 @@
+# Generated by Django 2.2 on 2026-10-17 11:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_tickets(apps, schema_editor):
+    """
+    Merge tickets duplicated by concurrent `get_or_create` calls so that the
+    unique constraint can be added. The oldest ticket is kept and remains
+    ignored if any of its duplicates were.
+    """
+    Ticket = apps.get_model('alerts', 'Ticket')
+    duplicates = (
+        Ticket.objects
+        .values('event', 'title', 'price')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        tickets = list(
+            Ticket.objects
+            .filter(
+                event=duplicate['event'],
+                title=duplicate['title'],
+                price=duplicate['price'],
+            )
+            .order_by('id')
+        )
+        kept, others = tickets[0], tickets[1:]
+        kept.ignore = any(ticket.ignore for ticket in tickets)
+        kept.save(update_fields=['ignore'])
+        Ticket.objects.filter(id__in=[ticket.id for ticket in others]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0004_event_ticket_validators'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_tickets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(fields=('event', 'title', 'price'), name='unique_event_ticket'),
+        ),
+    ]
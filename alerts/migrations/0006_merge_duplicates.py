@@ -0,0 +1,83 @@
+# Generated by Django 2.2 on 2026-10-17 14:00
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_duplicate_events(apps, schema_editor):
+    """
+    Merge events sharing a url into the oldest one so that the url can be
+    made unique. Trackers are moved over, leaving any duplicates for
+    `remove_duplicate_trackers`. Tickets are moved over too, keeping their
+    `ignore` flags, and a ticket already on the kept event stays ignored if
+    its duplicate was.
+    """
+    Event = apps.get_model('alerts', 'Event')
+    Ticket = apps.get_model('alerts', 'Ticket')
+    Tracker = apps.get_model('alerts', 'Tracker')
+    duplicates = (
+        Event.objects
+        .values('url')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        events = list(
+            Event.objects.filter(url=duplicate['url']).order_by('id')
+        )
+        kept, others = events[0], events[1:]
+        Tracker.objects.filter(event__in=others).update(event=kept)
+
+        tickets = {
+            (ticket.title, ticket.price): ticket
+            for ticket in Ticket.objects.filter(event=kept)
+        }
+        for ticket in Ticket.objects.filter(event__in=others).order_by('id'):
+            existing = tickets.get((ticket.title, ticket.price))
+            if existing is None:
+                ticket.event = kept
+                ticket.save(update_fields=['event'])
+                tickets[ticket.title, ticket.price] = ticket
+                continue
+            if ticket.ignore and not existing.ignore:
+                existing.ignore = True
+                existing.save(update_fields=['ignore'])
+            ticket.delete()
+
+        Event.objects.filter(id__in=[event.id for event in others]).delete()
+
+
+def remove_duplicate_trackers(apps, schema_editor):
+    """
+    Merge trackers for the same email and event into the oldest one, which
+    is left unsent if any of its duplicates were unsent.
+    """
+    Tracker = apps.get_model('alerts', 'Tracker')
+    duplicates = (
+        Tracker.objects
+        .values('event', 'email')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        trackers = list(
+            Tracker.objects
+            .filter(event=duplicate['event'], email=duplicate['email'])
+            .order_by('id')
+        )
+        kept, others = trackers[0], trackers[1:]
+        kept.sent = all(tracker.sent for tracker in trackers)
+        kept.save(update_fields=['sent'])
+        Tracker.objects.filter(id__in=[tracker.id for tracker in others]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0005_ticket_unique_event_ticket'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_events, migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_trackers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0006_merge_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date'], name='event_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(available=True, ignore=False), fields=['event'], name='ticket_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tracker',
+            index=models.Index(condition=models.Q(sent=False), fields=['event'], name='tracker_unsent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(fields=('url',), name='unique_event_url'),
+        ),
+        migrations.AddConstraint(
+            model_name='tracker',
+            constraint=models.UniqueConstraint(fields=('event', 'email'), name='unique_event_tracker'),
+        ),
+    ]
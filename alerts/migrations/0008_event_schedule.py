@@ -0,0 +1,23 @@
+# Generated by Django 2.2 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0007_cron_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='churn',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='next_poll',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2 on 2026-10-17 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0009_ticket_transitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(verbose_name='event url')),
+                ('email', models.EmailField(max_length=254)),
+                ('datetime', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('added', 'Added'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('reason', models.CharField(blank=True, default='', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(status='pending'), fields=['id'], name='submission_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0010_submission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0011_event_lease'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(ignore=True), fields=['id'], name='ticket_ignored_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tracker',
+            index=models.Index(fields=['email'], name='tracker_email_idx'),
+        ),
+    ]
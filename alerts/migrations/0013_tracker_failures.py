@@ -0,0 +1,22 @@
+# Generated by Django 2.2 on 2026-10-17 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0012_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tracker',
+            name='failures',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='tickettransition',
+            index=models.Index(fields=['datetime'], name='transition_datetime_idx'),
+        ),
+    ]
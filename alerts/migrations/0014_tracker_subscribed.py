@@ -0,0 +1,29 @@
+# Generated by Django 2.2 on 2026-10-17 23:40
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_subscribed(apps, schema_editor):
+    """
+    Existing trackers were last armed when they were created.
+    """
+    Tracker = apps.get_model('alerts', 'Tracker')
+    Tracker.objects.update(subscribed=F('datetime'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0013_tracker_failures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tracker',
+            name='subscribed',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_subscribed, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,18 @@
 from django.db import models
+from django.utils import timezone
+
+
+class EventQuerySet(models.QuerySet):
+    def clear_ticket_validators(self):
+        """
+        Make the next poll of these events fetch and write their tickets even
+        if the widget is unchanged. Needed whenever the stored tickets are
+        changed other than by a poll, which would otherwise skip the widget
+        and leave them as they are.
+        """
+        return self.update(
+            tickets_etag='', tickets_last_modified='', tickets_hash=''
+        )
 
 
 class Event(models.Model):
@@ -6,10 +20,42 @@ class Event(models.Model):
     date = models.DateField('event date')
     url = models.URLField('event url', default='')
     resale_active = models.BooleanField(default=False)
+    tickets_etag = models.CharField(max_length=200, blank=True, default='')
+    tickets_last_modified = models.CharField(
+        max_length=100, blank=True, default=''
+    )
+    tickets_hash = models.CharField(max_length=64, blank=True, default='')
+    next_poll = models.DateTimeField(null=True, blank=True, db_index=True)
+    churn = models.FloatField(default=0)
+    lease_owner = models.CharField(max_length=64, blank=True, default='')
+    lease_expires = models.DateTimeField(null=True, blank=True)
+
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='event_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['url'], name='unique_event_url'),
+        ]
 
     def __str__(self):
         return f"<Event(title={self.title}, url={self.url})>"
 
+    @property
+    def ticket_validators(self):
+        return {
+            'etag': self.tickets_etag,
+            'last_modified': self.tickets_last_modified,
+            'hash': self.tickets_hash
+        }
+
+    def set_ticket_validators(self, validators):
+        self.tickets_etag = validators['etag']
+        self.tickets_last_modified = validators['last_modified']
+        self.tickets_hash = validators['hash']
+
 
 class Ticket(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
@@ -18,6 +64,28 @@ class Ticket(models.Model):
     available = models.BooleanField(default=False)
     ignore = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Tickets that `send` alerts for.
+            models.Index(
+                fields=['event'],
+                name='ticket_available_idx',
+                condition=models.Q(available=True, ignore=False)
+            ),
+            # Ignored tickets listed in the admin.
+            models.Index(
+                fields=['id'],
+                name='ticket_ignored_idx',
+                condition=models.Q(ignore=True)
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'title', 'price'],
+                name='unique_event_ticket'
+            )
+        ]
+
     def __str__(self):
         return (f"<Ticket(title={self.title}, event={self.event.title}, "
                 f"available={self.available})>")
@@ -28,7 +96,96 @@ class Tracker(models.Model):
     email = models.EmailField()
     datetime = models.DateTimeField(auto_now_add=True)
     sent = models.BooleanField(default=False)
+    # When the tracker was last armed to be alerted, either on creation or by
+    # `sent` being reset. See `pending_trackers`.
+    subscribed = models.DateTimeField(default=timezone.now)
+    # Failed attempts to deliver the alert, see `send_alerts`.
+    failures = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Events that `update` polls and trackers that `send` alerts.
+            models.Index(
+                fields=['event'],
+                name='tracker_unsent_idx',
+                condition=models.Q(sent=False)
+            ),
+            # Trackers searched for by email in the admin.
+            models.Index(fields=['email'], name='tracker_email_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'email'],
+                name='unique_event_tracker'
+            ),
+        ]
 
     def __str__(self):
         return (f"<Tracker(event={self.event.title}, email={self.email}, "
                 f"sent={self.sent})>")
+
+
+class TicketTransition(models.Model):
+    """
+    Append-only record of a ticket becoming available or unavailable.
+    """
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE)
+    available = models.BooleanField()
+    datetime = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Transitions re-read behind the `send` cursor.
+            models.Index(fields=['datetime'], name='transition_datetime_idx'),
+        ]
+
+    def __str__(self):
+        return (f"<TicketTransition(ticket={self.ticket.title}, "
+                f"available={self.available}, datetime={self.datetime})>")
+
+
+class Cursor(models.Model):
+    """
+    Position of a consumer of the ticket transition log.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    datetime = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"<Cursor(name={self.name}, position={self.position})>"
+
+
+class Submission(models.Model):
+    """
+    Tracker requested from the index form, waiting for its event to be
+    scraped in the background.
+    """
+    PENDING = 'pending'
+    ADDED = 'added'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (ADDED, 'Added'),
+        (FAILED, 'Failed'),
+    ]
+
+    url = models.URLField('event url')
+    email = models.EmailField()
+    datetime = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default=PENDING)
+    reason = models.CharField(max_length=20, blank=True, default='')
+    attempts = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='submission_pending_idx',
+                condition=models.Q(status='pending')
+            ),
+        ]
+
+    def __str__(self):
+        return (f"<Submission(url={self.url}, email={self.email}, "
+                f"status={self.status})>")
@@ -0,0 +1,54 @@
+"""
+Adaptive polling schedule for tracked events.
+
+Each event keeps the time it is next due to be polled. The interval until
+then shrinks as the event approaches, as its tickets change more often and
+as more people are waiting on it, so that the request budget of each
+`update` run is spent where resale tickets are most likely to appear.
+"""
+import datetime
+import math
+
+from django.conf import settings
+
+# Minutes between polls by the number of days until the event.
+INTERVALS = (
+    (2, 10),
+    (7, 30),
+    (30, 60),
+    (90, 180),
+)
+MAX_INTERVAL = 360
+
+# Weight given to the latest poll in the moving average of changes.
+CHURN_WEIGHT = 0.3
+
+
+def update_churn(churn, changed):
+    """
+    Exponential moving average of how often polls find ticket changes.
+    """
+    return (1 - CHURN_WEIGHT) * churn + CHURN_WEIGHT * float(changed)
+
+
+def poll_interval(days, churn, watching):
+    minutes = next(
+        (minutes for limit, minutes in INTERVALS if days <= limit),
+        MAX_INTERVAL
+    )
+    # An event whose tickets change on every poll is polled four times as
+    # often, as is one with a thousand people waiting on it.
+    minutes /= 1 + 3 * churn
+    minutes /= 1 + math.log10(max(watching, 1))
+    return datetime.timedelta(
+        minutes=max(minutes, settings.POLL_MIN_INTERVAL)
+    )
+
+
+def schedule(event, changed, watching, now):
+    """
+    Set when `event` is next due to be polled after a poll at `now`.
+    """
+    event.churn = update_churn(event.churn, changed)
+    days = (event.date - now.date()).days
+    event.next_poll = now + poll_interval(days, event.churn, watching)
@@ -0,0 +1,243 @@
+"""
+Scraping of RA event pages and ticket widgets.
+
+Import from `alerts` rather than from this module so that the scraper is
+only loaded when it is first used.
+"""
+import datetime
+import hashlib
+import json
+import re
+from typing import List, NamedTuple
+
+import lxml.etree
+
+from . import ExtractionError, client, metrics
+
+EVENT_ID_PATTERN = re.compile(r"https?:\/\/(?:www\.)?ra.co\/events\/(\d+)")
+# RA pages are rendered by Next.js, which embeds the page data as JSON in a
+# script with this id.
+NEXT_DATA_ID = 'id="__NEXT_DATA__"'
+
+# XPath expressions are compiled once at import rather than on every call.
+TITLE_XPATH = lxml.etree.XPath('//h1//text()')
+DATE_XPATH = lxml.etree.XPath("//span[text() = 'Date']/../..//a//text()")
+TICKETS_XPATH = lxml.etree.XPath("//li[@id='ticket-types']/ul/li")
+TICKET_TITLE_XPATH = lxml.etree.XPath(
+    './/div[@class="pr8"]/text() | .//div[@class="type-title"]/text()'
+)
+PRICE_XPATH = lxml.etree.XPath('.//div[@class="type-price"]/text()')
+AVAILABILITY_XPATH = lxml.etree.XPath('./@class')
+AVAILABILITY = {'closed': False, 'onsale but': True}
+
+
+class EventInfo(NamedTuple):
+    title: str
+    date: datetime.date
+
+
+class TicketInfo(NamedTuple):
+    title: str
+    price: str
+    available: bool
+
+
+class Page(NamedTuple):
+    title: str
+    date: datetime.date
+    tickets: List[TicketInfo]
+    resale_active: bool
+
+
+def make_request(url, headers=None):
+    return client.get(url, headers=headers)
+
+
+def extract_event_id(url):
+    return EVENT_ID_PATTERN.search(url)[1]
+
+
+def extract_title(dom):
+    return TITLE_XPATH(dom)[0]
+
+
+def extract_embedded_event(html):
+    """
+    Extract the title and date of an event from the data embedded in its
+    page without parsing the HTML. Returns None if the data is missing or
+    not as expected.
+    """
+    data = find_embedded_data(html)
+    if data is None:
+        return None
+    try:
+        state = json.loads(data)['props']['apolloState']
+        # The page's own event is the one its query refers to. Related
+        # events are also in the state.
+        ref = next(
+            value['__ref'] for key, value in state['ROOT_QUERY'].items()
+            if key.startswith('event(')
+        )
+        event = state[ref]
+        title = event['title']
+        date = datetime.date.fromisoformat(event['date'][:10])
+    except (ValueError, KeyError, TypeError, StopIteration):
+        return None
+    if not isinstance(title, str) or not title:
+        return None
+    return EventInfo(title=title, date=date)
+
+
+def find_embedded_data(html):
+    # Plain string searches are much faster than a regular expression
+    # spanning the whole script.
+    start = html.find(NEXT_DATA_ID)
+    if start == -1:
+        return None
+    start = html.find('>', start) + 1
+    end = html.find('</script>', start)
+    if start == 0 or end == -1:
+        return None
+    return html[start:end]
+
+
+def extract_date(dom):
+    extracted = DATE_XPATH(dom)
+    extracted = extracted[0].strip()
+    extracted = extracted.rsplit(', ', maxsplit=1)[-1]
+    return datetime.datetime.strptime(extracted, '%d %b %Y').date()
+
+
+def extract_tickets(dom):
+    for ticket in TICKETS_XPATH(dom):
+        yield TicketInfo(
+            title=extract_ticket_title(ticket),
+            price=extract_price(ticket),
+            available=extract_availability(ticket)
+        )
+
+
+def extract_ticket_title(element):
+    return TICKET_TITLE_XPATH(element)[0]
+
+
+def extract_price(element):
+    return PRICE_XPATH(element)[0]
+
+
+def extract_availability(element):
+    availability = AVAILABILITY_XPATH(element)[0]
+    return AVAILABILITY.get(availability, False)
+
+
+def is_resale_active(tickets):
+    return not any(ticket.available for ticket in tickets)
+
+
+def parse_html(html):
+    dom = lxml.etree.HTML(html)
+    if dom is None:
+        raise ExtractionError()
+    return dom
+
+
+@metrics.timed('parse_seconds', stage='parse', document='tickets')
+def parse_tickets(html):
+    dom = parse_html(html)
+    try:
+        tickets = list(extract_tickets(dom))
+    except IndexError:
+        raise ExtractionError()
+    return tickets
+
+
+@metrics.timed('parse_seconds', stage='parse', document='event')
+def parse_event(html):
+    """
+    Extract the title and date of an event from its page, falling back to
+    the HTML if the embedded data cannot be used.
+    """
+    event = extract_embedded_event(html)
+    if event is not None:
+        return event
+    if metrics.enabled():
+        metrics.increment('parse_fallbacks_total', document='event')
+    return parse_event_html(html)
+
+
+def parse_event_html(html):
+    dom = parse_html(html)
+    try:
+        title = extract_title(dom)
+        date = extract_date(dom)
+    except IndexError:
+        raise ExtractionError()
+    return EventInfo(title=title, date=date)
+
+
+def get_ticket_url(url):
+    event_id = extract_event_id(url)
+    return f"https://ra.co/widget/event/{event_id}/embedtickets"
+
+
+def get_tickets(url):
+    html = make_request(get_ticket_url(url))
+    return parse_tickets(html.text)
+
+
+def get_event(url):
+    html = make_request(url)
+    return parse_event(html.text)
+
+
+def fetch_tickets(url, validators=None):
+    """
+    Download the raw ticket widget unless it is unchanged since `validators`.
+
+    The ETag and Last-Modified values from a previous fetch are sent as
+    conditional headers. As RA does not always honour them, a hash of the
+    body is also compared against the previous one. Returns the widget HTML,
+    or None if it is unchanged, along with the validators for the next fetch.
+    Raises `client.ResponseError` for any other response than 200 or 304 so
+    that an error page is never stored as the widget.
+    """
+    validators = validators or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    response = make_request(get_ticket_url(url), headers=headers)
+    if response.status_code == 304:
+        return None, validators
+    if response.status_code != 200:
+        raise client.ResponseError(
+            f"RA responded {response.status_code} to {response.url}.",
+            response=response
+        )
+
+    digest = hashlib.sha256(response.content).hexdigest()
+    latest = {
+        'etag': response.headers.get('ETag', ''),
+        'last_modified': response.headers.get('Last-Modified', ''),
+        'hash': digest
+    }
+    if digest == validators.get('hash'):
+        return None, latest
+    return response.text, latest
+
+
+def get_page(url):
+    """
+    Fetch an event's metadata and tickets. Use `fetch_tickets` to poll the
+    tickets of an event that is already tracked.
+    """
+    event = get_event(url)
+    tickets = get_tickets(url)
+    return Page(
+        title=event.title,
+        date=event.date,
+        tickets=tickets,
+        resale_active=is_resale_active(tickets)
+    )
@@ -0,0 +1,263 @@
+import datetime
+import time
+from unittest import mock
+
+from django.contrib import admin
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import client, fetch_tickets, locks
+from .admin import TicketAdmin, TrackerAdmin
+from .models import (
+    Cursor, Event, Submission, Ticket, TicketTransition, Tracker
+)
+from .views import (
+    pending_submissions, poll_due, process_submissions, prune_expired,
+    send_alerts, update_tracker
+)
+
+
+class FakeSession:
+    """
+    Session whose requests to RA each take `latency` seconds and respond
+    with `status`.
+    """
+    def __init__(self, latency=0, status=200):
+        self.latency = latency
+        self.status = status
+        self.requests = 0
+
+    def get(self, url, timeout=None, headers=None):
+        self.requests += 1
+        time.sleep(self.latency)
+        return mock.Mock(
+            status_code=self.status, headers={}, url=url,
+            content=b'<html></html>', text='<html></html>'
+        )
+
+
+@override_settings(
+    RA_RATE=20, RA_MIN_RATE=1, RA_BURST=1, RA_CONCURRENCY=1, RA_RETRIES=0,
+    RA_BREAKER_THRESHOLD=0.5, RA_BREAKER_VOLUME=3, RA_BREAKER_WINDOW=60,
+    RA_BREAKER_SLOW=0.02, RA_BREAKER_COOLDOWN=60,
+)
+class RateLimitedCircuitTests(SimpleTestCase):
+    def setUp(self):
+        client._limiter = client._breaker = None
+
+    def tearDown(self):
+        client._limiter = client._breaker = None
+
+    def get(self, session, requests):
+        with mock.patch.object(client, 'get_session', return_value=session):
+            for _ in range(requests):
+                client.get('https://ra.co/events/1')
+
+    def test_limiter_waits_are_not_slow_requests(self):
+        # Past the burst each request waits 0.05s for the limiter, longer
+        # than the slow threshold, but RA itself answers straight away.
+        start = time.monotonic()
+        self.get(FakeSession(), 5)
+        self.assertGreater(time.monotonic() - start, 0.15)
+        self.assertEqual(client.circuit_state(), client.CircuitBreaker.CLOSED)
+
+    def test_slow_requests_open_the_circuit(self):
+        with self.assertRaises(client.CircuitOpenError):
+            self.get(FakeSession(latency=0.03), 5)
+        self.assertEqual(client.circuit_state(), client.CircuitBreaker.OPEN)
+
+
+@override_settings(
+    RA_RATE=1000, RA_BURST=1000, RA_RETRIES=2, RA_RETRY_BACKOFF=0.001,
+    RA_BREAKER_VOLUME=1000,
+)
+class ErrorResponseTests(TestCase):
+    def setUp(self):
+        client._limiter = client._breaker = None
+
+    def tearDown(self):
+        client._limiter = client._breaker = None
+
+    def test_raises_once_retries_are_used_up(self):
+        session = FakeSession(status=503)
+        with mock.patch.object(client, 'get_session', return_value=session):
+            with self.assertRaises(client.ResponseError):
+                client.get('https://ra.co/events/1')
+        self.assertEqual(session.requests, 3)
+
+    def test_error_pages_are_not_stored_as_the_widget(self):
+        session = FakeSession(status=404)
+        with mock.patch.object(client, 'get_session', return_value=session):
+            with self.assertRaises(client.ResponseError):
+                fetch_tickets('https://ra.co/events/1', {'hash': 'abc'})
+
+    def test_failed_polls_keep_their_validators(self):
+        event = Event.objects.create(
+            title='Event', url='https://ra.co/events/1', tickets_hash='abc',
+            date=timezone.now().date()
+        )
+        Tracker.objects.create(email='a@example.com', event=event)
+        session = FakeSession(status=503)
+        with mock.patch.object(client, 'get_session', return_value=session):
+            outcomes = [outcome for outcome, _ in poll_due()]
+        self.assertEqual(outcomes, ['failed'])
+        event.refresh_from_db()
+        self.assertEqual(event.tickets_hash, 'abc')
+
+
+class TicketAdminTests(TestCase):
+    def test_unignoring_tickets_polls_their_event_in_full(self):
+        event = Event.objects.create(
+            title='Event', url='https://ra.co/events/1', tickets_hash='abc',
+            date=timezone.now().date()
+        )
+        Ticket.objects.create(event=event, title='Early', price='£10',
+                              ignore=True)
+        ticket_admin = TicketAdmin(Ticket, admin.site)
+        with mock.patch.object(ticket_admin, 'message_user'):
+            ticket_admin.unignore_tickets(None, Ticket.objects.all())
+        event.refresh_from_db()
+        self.assertEqual(event.ticket_validators, {
+            'etag': '', 'last_modified': '', 'hash': ''
+        })
+
+
+class SendAlertsTests(TestCase):
+    def setUp(self):
+        self.event = Event.objects.create(
+            title='Event', url='https://ra.co/events/1',
+            date=timezone.now().date()
+        )
+        self.ticket = Ticket.objects.create(
+            event=self.event, title='Early', price='£10', available=True
+        )
+        self.tracker = Tracker.objects.create(
+            email='a@example.com', event=self.event, subscribed=self.ago(3600)
+        )
+
+    def ago(self, seconds):
+        return timezone.now() - datetime.timedelta(seconds=seconds)
+
+    def transition(self, seconds_ago=0):
+        transition = TicketTransition.objects.create(
+            ticket=self.ticket, available=True
+        )
+        TicketTransition.objects.filter(id=transition.id).update(
+            datetime=self.ago(seconds_ago)
+        )
+        return transition
+
+    def move_cursor(self, position, seconds_ago=0):
+        Cursor.objects.update_or_create(name='send', defaults={
+            'position': position, 'datetime': self.ago(seconds_ago)
+        })
+
+    def send(self):
+        return [
+            (outcome, tracker.email) for outcome, (tracker, _) in send_alerts()
+        ]
+
+    def test_released(self):
+        self.move_cursor(0, seconds_ago=3600)
+        self.transition()
+        self.assertEqual(self.send(), [('sent', 'a@example.com')])
+        self.assertEqual(self.send(), [])
+
+    def test_new_subscriber(self):
+        self.move_cursor(self.transition(seconds_ago=3600).id, 600)
+        Tracker.objects.create(email='b@example.com', event=self.event)
+        self.assertEqual(self.send(), [('sent', 'b@example.com')])
+
+    def test_rearmed(self):
+        self.move_cursor(self.transition(seconds_ago=3600).id, 600)
+        Tracker.objects.filter(id=self.tracker.id).update(sent=True)
+
+        tracker = update_tracker('a@example.com', self.event, sent=False)
+        tracker.save()
+        self.assertEqual(self.send(), [('sent', 'a@example.com')])
+
+        tracker_admin = TrackerAdmin(Tracker, admin.site)
+        with mock.patch.object(tracker_admin, 'message_user'):
+            tracker_admin.reset_sent(None, Tracker.objects.all())
+        self.assertEqual(self.send(), [('sent', 'a@example.com')])
+
+    @override_settings(SEND_ATTEMPTS=2)
+    def test_retry(self):
+        self.move_cursor(0, seconds_ago=3600)
+        self.transition()
+        error = Exception('SMTP is down.')
+        with mock.patch('alerts.views.deliver',
+                        side_effect=lambda ms: [(m, error) for m in ms]):
+            self.assertEqual(self.send(), [('failed', 'a@example.com')])
+        self.assertEqual(self.send(), [('sent', 'a@example.com')])
+
+        self.tracker.refresh_from_db()
+        self.assertEqual(self.tracker.failures, 1)
+
+    @override_settings(SEND_ATTEMPTS=2)
+    def test_retries_stop_after_send_attempts(self):
+        # Logged before the lag window, so the transition is only read once.
+        self.move_cursor(0, seconds_ago=3600)
+        self.transition(seconds_ago=600)
+        error = Exception('SMTP is down.')
+        with mock.patch('alerts.views.deliver',
+                        side_effect=lambda ms: [(m, error) for m in ms]):
+            self.assertEqual(self.send(), [('failed', 'a@example.com')])
+            self.assertEqual(self.send(), [('failed', 'a@example.com')])
+        self.assertEqual(self.send(), [])
+
+    @override_settings(SEND_CURSOR_LAG=120)
+    def test_lag_window(self):
+        # Transitions that became visible after the cursor moved past their
+        # ids are picked up while within the lag of the previous run.
+        late = self.transition(seconds_ago=90)
+        self.move_cursor(late.id, seconds_ago=30)
+        self.assertEqual(self.send(), [('sent', 'a@example.com')])
+
+    @override_settings(SEND_CURSOR_LAG=120)
+    def test_outside_lag_window(self):
+        old = self.transition(seconds_ago=600)
+        self.move_cursor(old.id, seconds_ago=30)
+        self.assertEqual(self.send(), [])
+
+
+@mock.patch.object(locks, 'exclusive')
+class LockedStageTests(TestCase):
+    """
+    Stages whose lock is held by another process are skipped.
+    """
+    def setUp(self):
+        event = Event.objects.create(
+            title='Event', url='https://ra.co/events/1',
+            date=timezone.now().date() - datetime.timedelta(days=30)
+        )
+        ticket = Ticket.objects.create(
+            event=event, title='Early', price='£10', available=True
+        )
+        TicketTransition.objects.create(ticket=ticket, available=True)
+        Tracker.objects.create(email='a@example.com', event=event)
+        Submission.objects.create(
+            url='https://ra.co/events/2', email='b@example.com'
+        )
+
+    def held(self, exclusive):
+        exclusive.return_value.__enter__.return_value = False
+
+    def test_send_is_skipped(self, exclusive):
+        self.held(exclusive)
+        self.assertEqual(list(send_alerts()), [])
+        self.assertFalse(Cursor.objects.exists())
+        exclusive.assert_called_once_with('send')
+
+    def test_submissions_are_skipped(self, exclusive):
+        self.held(exclusive)
+        results = process_submissions(pending_submissions())
+        self.assertEqual(sum(map(len, results.values())), 0)
+        self.assertEqual(
+            Submission.objects.get().status, Submission.PENDING
+        )
+
+    def test_prune_is_skipped(self, exclusive):
+        self.held(exclusive)
+        self.assertEqual(prune_expired(), {})
+        self.assertTrue(Event.objects.exists())
@@ -0,0 +1,123 @@
+"""
+Recording and replaying of responses from RA.
+
+With `RA_TRANSPORT` set to `record` every response from RA is appended to
+the archive at `RA_ARCHIVE` as it is received. With it set to `replay` no
+requests leave the process: each request is answered from the archive
+instead, so that the scraper can be load tested and profiled offline and
+the same traffic replayed run after run.
+
+The archive holds one JSON object per response and is gzipped if its name
+ends in `.gz`. Responses to the same url are replayed in the order they
+were recorded, with the last one repeated once they run out, after the
+recorded latency divided by `RA_REPLAY_SPEED`. At most
+`RA_REPLAY_CONCURRENCY` responses are replayed at once.
+"""
+import collections
+import gzip
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# The body is archived decoded so these no longer describe it.
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+def open_archive(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def dump_response(response):
+    return {
+        'url': response.url,
+        'method': response.request.method,
+        'status': response.status_code,
+        'headers': {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in DROPPED_HEADERS
+        },
+        # Bytes that are not valid UTF-8 survive the round trip as escaped
+        # surrogates.
+        'body': response.content.decode('utf-8', 'surrogateescape'),
+        'elapsed': response.elapsed.total_seconds(),
+    }
+
+
+def load_response(record, request):
+    response = requests.Response()
+    response.status_code = record['status']
+    response.headers = CaseInsensitiveDict(record['headers'])
+    response._content = record['body'].encode('utf-8', 'surrogateescape')
+    response.encoding = requests.utils.get_encoding_from_headers(
+        response.headers
+    )
+    response.url = request.url
+    response.request = request
+    response.reason = ''
+    return response
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Transport adapter that appends every response to an archive.
+    """
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        line = json.dumps(dump_response(response)) + '\n'
+        with self._lock:
+            with open_archive(self.path, 'a') as f:
+                f.write(line)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter that answers requests from an archive.
+    """
+    def __init__(self, path, speed=1.0, concurrency=10):
+        super().__init__()
+        self.speed = speed
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.responses = collections.defaultdict(collections.deque)
+        with open_archive(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.responses[record['method'], record['url']].append(
+                        record
+                    )
+        self._lock = threading.Lock()
+
+    def next_record(self, request):
+        with self._lock:
+            records = self.responses.get((request.method, request.url))
+            if not records:
+                return None
+            if len(records) > 1:
+                return records.popleft()
+            return records[0]
+
+    def send(self, request, **kwargs):
+        record = self.next_record(request)
+        if record is None:
+            raise requests.exceptions.ConnectionError(
+                f"No recorded response for {request.url}.", request=request
+            )
+        with self.slots:
+            if self.speed:
+                time.sleep(record['elapsed'] / self.speed)
+            return load_response(record, request)
+
+    def close(self):
+        pass
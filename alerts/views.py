@@ -1,21 +1,50 @@
+import collections
 import datetime
+import hmac
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.utils import timezone
 import os
 
-from smtplib import SMTPException
-
-import requests
-
+from django.conf import settings
 from django.core import mail
-from django.http import HttpResponseRedirect, JsonResponse, Http404
+from django.db import transaction
+from django.db.models import (
+    Count, F, IntegerField, Max, OuterRef, Q, Subquery
+)
+from django.db.models.functions import Mod
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse,
+    StreamingHttpResponse, Http404
+)
 from django.shortcuts import render
 from django.urls import reverse
 
-from . import get_page, ResaleInactiveError, ExtractionError, EventExpiredError
-from .models import Tracker, Event, Ticket
+# The scraper, and requests with it, is imported by the views that scrape
+# so that it is not loaded for those that do not. See `alerts.__init__`.
+from . import locks, metrics
+from . import ResaleInactiveError, ExtractionError, EventExpiredError
+from .delivery import deliver
+from .models import (
+    Tracker, Event, Ticket, TicketTransition, Cursor, Submission
+)
+from .scheduling import schedule
 from .forms import TrackerForm
 
 
+FAILURE_MESSAGES = {
+    'other': "Not sure what.",
+    'url': "This doesn't look like a valid event page.",
+    'form': ("Something in the form wasn't right. Are you sure"
+             " this is a valid email address and event page?"),
+    'timeout': "RA took too long to respond. Is the site down?",
+    'date': "This event has already happend.",
+    'extract': "Could not extract ticket information from RA.",
+    'inactive': "Resale is not active for this event."
+}
+
+
 def index(request):
     if request.method == 'POST':
         form = TrackerForm(request.POST)
@@ -23,44 +52,55 @@ def index(request):
         if not form.is_valid():
             return failure_redirect('form')
 
-        url = form.cleaned_data['url']
-        email = form.cleaned_data['email']
-
-        try:
-            add_tracker(url, email)
-            return HttpResponseRedirect('/success')
-
-        except requests.exceptions.MissingSchema:
-            return failure_redirect('url')
-
-        except (requests.exceptions.Timeout,
-                requests.exceptions.ConnectionError):
-            return failure_redirect('timeout')
-
-        except EventExpiredError:
-            return failure_redirect('date')
-
-        except ResaleInactiveError:
-            return failure_redirect('inactive')
-
-        except ExtractionError:
-            return failure_redirect('extract')
+        # The event is scraped in the background by `process_submissions`
+        # and the outcome emailed, so that a slow RA never holds up the form.
+        Submission.objects.create(
+            url=form.cleaned_data['url'],
+            email=form.cleaned_data['email'],
+        )
+        return HttpResponseRedirect('/success')
 
     form = TrackerForm(label_suffix='')
     return render(request, 'alerts/index.html', {'form': form})
 
 
 def add_tracker(url, email):
-    page = get_page(url)
+    from . import get_page
+    return create_tracker(get_page(url), url, email)
 
-    event = update_event(page, url)
+
+def create_tracker(page, url, email):
+    event, is_created = update_event(page, url)
     event.save()
 
-    for ticket in update_tickets(page['tickets'], event):
-        ticket.save()
+    # The page may have come from the page cache, so its tickets can be older
+    # than those stored. They are only used for a new event, and the tickets
+    # of existing events are left to `poll_events`.
+    if is_created:
+        update_tickets(page.tickets, event)
 
     tracker = update_tracker(email, event, sent=False)
     tracker.save()
+    return tracker
+
+
+def failure_reason(error):
+    """
+    Key of the failure message for an error raised by `add_tracker`.
+    """
+    import requests
+    if isinstance(error, requests.exceptions.MissingSchema):
+        return 'url'
+    if isinstance(error, (requests.exceptions.Timeout,
+                          requests.exceptions.ConnectionError)):
+        return 'timeout'
+    if isinstance(error, EventExpiredError):
+        return 'date'
+    if isinstance(error, ResaleInactiveError):
+        return 'inactive'
+    if isinstance(error, ExtractionError):
+        return 'extract'
+    return 'other'
 
 
 def failure_redirect(message):
@@ -78,17 +118,7 @@ def privacy(request):
 
 def failure(request):
     raw = request.GET.get('message', 'other')
-    messages = {
-        'other': "Not sure what.",
-        'url': "This doesn't look like a valid event page.",
-        'form': ("Something in the form wasn't right. Are you sure"
-                 " this is a valid email address and event page?"),
-        'timeout': "RA took too long to respond. Is the site down?",
-        'date': "This event has already happend.",
-        'extract': "Could not extract ticket information from RA.",
-        'inactive': "Resale is not active for this event."
-    }
-    message = messages.get(raw, messages['other'])
+    message = FAILURE_MESSAGES.get(raw, FAILURE_MESSAGES['other'])
     return render(request, 'alerts/failure.html', {'message': message})
 
 
@@ -105,57 +135,393 @@ def app_engine_cron(fn):
     return wraps
 
 
+@app_engine_cron
+def submissions(request):
+    from . import client
+    if client.circuit_open():
+        return circuit_open_response()
+    results = process_submissions(pending_submissions())
+    outcomes = (
+        (outcome, submission)
+        for outcome, submitted in results.items()
+        for submission in submitted
+    )
+    return outcome_response(request, outcomes, describe_submission)
+
+
+def describe_submission(submission):
+    return {'email': submission.email, 'url': submission.url}
+
+
+def pending_submissions(budget=None):
+    budget = budget or settings.SUBMISSION_BUDGET
+    return (
+        Submission.objects
+        .filter(status=Submission.PENDING)
+        .order_by('id')[:budget]
+    )
+
+
+def process_submissions(submissions, workers=None):
+    """
+    Process `submissions` unless another process already is, see
+    `scrape_submissions`. Returns the submissions by outcome.
+    """
+    with locks.exclusive('submissions') as locked:
+        if not locked:
+            return {'added': [], 'failed': [], 'retrying': []}
+        return scrape_submissions(submissions, workers)
+
+
+def scrape_submissions(submissions, workers=None):
+    """
+    Scrape the events of `submissions` concurrently, add their trackers and
+    email each submitter the outcome.
+
+    As in `poll_events`, pages are fetched on worker threads and database
+    writes happen on the calling thread. Pages are shared through the page
+    cache so that many submissions for the same event make one fetch.
+    Submissions that fail with a timeout or connection error stay pending to
+    be retried until they have been attempted `SUBMISSION_ATTEMPTS` times,
+    and those not attempted because RA is down are left for the next run.
+    Any other error fails the submission.
+    """
+    import requests
+    from . import client
+
+    workers = workers or settings.RA_POLL_WORKERS
+    results = {'added': [], 'failed': [], 'retrying': []}
+    messages = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(fetch_cached_page, submission.url): submission
+            for submission in submissions
+        }
+        for future in as_completed(futures):
+            submission = futures[future]
+            try:
+                tracker = create_tracker(
+                    future.result(), submission.url, submission.email
+                )
+            except client.CircuitOpenError:
+                results['retrying'].append(submission)
+                continue
+            except Exception as e:
+                # One bad submission must not stop the rest of the batch
+                # from being recorded, so anything unexpected fails it too.
+                submission.attempts += 1
+                reason = failure_reason(e)
+                if (reason == 'timeout' and
+                        submission.attempts < settings.SUBMISSION_ATTEMPTS):
+                    results['retrying'].append(submission)
+                    continue
+                if not isinstance(e, (requests.exceptions.RequestException,
+                                      ExtractionError)):
+                    print(f"Failed to add tracker for {submission.url}.")
+                    print(e)
+                    metrics.record_error('submission', e)
+                submission.status = Submission.FAILED
+                submission.reason = reason
+                messages.append(create_failure_message(submission))
+                results['failed'].append(submission)
+                continue
+            submission.attempts += 1
+            submission.status = Submission.ADDED
+            messages.append(create_confirmation_message(tracker))
+            results['added'].append(submission)
+
+    Submission.objects.bulk_update(
+        [submission for processed in results.values()
+         for submission in processed],
+        ['status', 'reason', 'attempts']
+    )
+    for message, error in deliver(messages):
+        if error is not None:
+            print(f"Failed to send email to {message.to[0]}.")
+            print(error)
+
+    return results
+
+
+def fetch_cached_page(url):
+    """
+    Fetch `url` through the page cache on a worker thread. The database
+    cache opens a connection on the thread, which is closed again so that
+    it is not left open once the thread exits.
+    """
+    from django.db import connections
+    from .cache import get_cached_page
+    try:
+        return get_cached_page(url)
+    finally:
+        connections.close_all()
+
+
 @app_engine_cron
 def update(request):
+    try:
+        shard = int(request.GET.get('shard', 0))
+        shards = int(request.GET.get('shards', 1))
+    except ValueError:
+        return HttpResponseBadRequest('Invalid shard.')
+    if not 0 <= shard < shards:
+        return HttpResponseBadRequest('Invalid shard.')
+
+    from . import client
+    if client.circuit_open():
+        return circuit_open_response()
+
+    return outcome_response(request, poll_due(shard, shards), describe_event)
+
+
+def circuit_open_response():
+    """
+    Respond to a cron request that was skipped because RA is down.
+    """
+    from . import client
+    return JsonResponse(
+        {'response': 'unavailable', 'circuit': client.circuit_state()},
+        status=503
+    )
+
+
+def describe_event(event):
+    return {'event': event.title, 'url': event.url}
+
+
+def outcome_response(request, outcomes, describe):
+    """
+    Respond to a cron request with the number of rows processed per outcome.
+
+    `outcomes` is an iterator of `(outcome, row)` pairs which is consumed
+    once. With `?detail=1` every row is described and streamed as it is
+    processed, so that memory does not grow with the number of rows.
+    """
+    if request.GET.get('detail'):
+        return StreamingHttpResponse(
+            stream_outcomes(outcomes, describe),
+            content_type='application/json'
+        )
+    counts = collections.Counter(outcome for outcome, _ in outcomes)
+    return JsonResponse({'response': 'success', **counts})
+
+
+def stream_outcomes(outcomes, describe):
+    counts = collections.Counter()
+    yield '{"response": "success", "rows": ['
+    for outcome, row in outcomes:
+        separator = ', ' if counts else ''
+        counts[outcome] += 1
+        yield separator + json.dumps({'outcome': outcome, **describe(row)})
+    yield '], "counts": ' + json.dumps(counts) + '}'
+
+
+def poll_due(shard=0, shards=1):
+    """
+    Claim the due events in `shard` of `shards` and poll them. Yields
+    `(outcome, event)` pairs, see `poll_events`.
+    """
+    events = claim_events(due_events(shard, shards), owner=uuid.uuid4().hex)
+    return poll_events(events)
+
+
+def tracked_events():
     tracked = Tracker.objects.filter(sent=False).values('event').distinct()
-    tracked_events = Event.objects.filter(id__in=tracked)
-
-    for event in tracked_events:
-        try:
-            page = get_page(event.url)
-            for ticket in update_tickets(page['tickets'], event):
-                ticket.save()
-        except (requests.exceptions.Timeout,
-                requests.exceptions.ConnectionError):
-            print(f"Error updating {event.title}")
-            continue
+    return Event.objects.filter(id__in=tracked)
 
-    return JsonResponse({
-        'response': 'success',
-        'updated': [
-            {'event': event.title, 'url': event.url}
-            for event in tracked_events
-        ]
-    })
 
+def due_events(shard=0, shards=1):
+    """
+    Tracked events in `shard` of `shards` that are due to be polled and not
+    leased to another worker, most overdue first.
+    """
+    now = timezone.now()
+    events = (
+        tracked_events()
+        .filter(Q(next_poll__isnull=True) | Q(next_poll__lte=now))
+        .filter(Q(lease_expires__isnull=True) | Q(lease_expires__lte=now))
+    )
+    if shards > 1:
+        events = events.annotate(shard=Mod('id', shards)).filter(shard=shard)
+    return events.order_by(F('next_poll').asc(nulls_first=True))
 
-def update_tickets(tickets, event):
-    for ticket in tickets:
-        ticket_obj, _ = Ticket.objects.get_or_create(
-            event=event,
-            title=ticket['title'],
-            price=ticket['price'],
+
+def claim_events(events, owner, budget=None):
+    """
+    Lease up to `budget` of `events` to `owner` for `POLL_LEASE_SECONDS`.
+
+    Candidates are locked with `SELECT ... FOR UPDATE SKIP LOCKED` where the
+    database supports it so that concurrent workers pass over each other's
+    events, and the lease is only taken if it is still free. A worker that
+    dies leaves its leases to expire. Returns the claimed events annotated
+    with the number of people waiting on each.
+    """
+    budget = budget or settings.POLL_BUDGET
+    now = timezone.now()
+    expires = now + datetime.timedelta(seconds=settings.POLL_LEASE_SECONDS)
+    free = Q(lease_expires__isnull=True) | Q(lease_expires__lte=now)
+
+    with transaction.atomic():
+        ids = list(
+            events
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:budget]
+        )
+        Event.objects.filter(free, id__in=ids).update(
+            lease_owner=owner, lease_expires=expires
         )
-        if ticket_obj.ignore is True:
-            # Do not return tickets that have been set to ignore. This allows
+
+    return (
+        Event.objects
+        .filter(id__in=ids, lease_owner=owner)
+        .annotate(watching=Count('tracker', filter=Q(tracker__sent=False)))
+    )
+
+
+def poll_events(events, workers=None):
+    """
+    Fetch the ticket widgets of `events` concurrently and update their tickets.
+
+    Requests are made on a pool of worker threads. Parsing and database
+    writes happen on the calling thread as each fetch completes, so they never
+    hold up the requests still in flight and database connections are not
+    shared between threads. Events whose ticket widget is unchanged since the
+    last poll are neither parsed nor written. Event pages are not fetched as
+    the title and date are already stored, see `refresh_event`.
+
+    `events` must be annotated with `watching`, see `claim_events`. Each
+    event is rescheduled and its lease released, and the new schedules and
+    validators are saved with a bulk update every `POLL_WRITE_CHUNK_SIZE`
+    events. Events skipped because RA is down keep their schedule. Yields
+    `(outcome, event)` pairs as events are saved.
+    """
+    import requests
+    from . import client, fetch_tickets, parse_tickets
+
+    workers = workers or settings.RA_POLL_WORKERS
+    polled = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                fetch_tickets, event.url, event.ticket_validators
+            ): event
+            for event in events
+        }
+        for future in as_completed(futures):
+            event = futures[future]
+            event.lease_owner = ''
+            event.lease_expires = None
+            try:
+                html, validators = future.result()
+                changed = []
+                if html is not None:
+                    changed = update_tickets(parse_tickets(html), event)
+            except client.CircuitOpenError:
+                polled.append(('skipped', event))
+            except (requests.exceptions.Timeout,
+                    requests.exceptions.ConnectionError,
+                    ExtractionError):
+                print(f"Error updating {event.title}")
+                schedule(event, False, event.watching, timezone.now())
+                polled.append(('failed', event))
+            else:
+                # Only store the validators once the tickets have been written
+                # so that a failed update is retried in full on the next poll.
+                event.set_ticket_validators(validators)
+                schedule(event, bool(changed), event.watching, timezone.now())
+                outcome = 'updated' if html is not None else 'unchanged'
+                polled.append((outcome, event))
+
+            if len(polled) >= settings.POLL_WRITE_CHUNK_SIZE:
+                yield from save_polled(polled)
+                polled = []
+
+    yield from save_polled(polled)
+
+
+def save_polled(polled):
+    Event.objects.bulk_update([event for _, event in polled], [
+        'tickets_etag', 'tickets_last_modified', 'tickets_hash',
+        'churn', 'next_poll', 'lease_owner', 'lease_expires'
+    ])
+    return polled
+
+
+@metrics.timed('update_tickets_seconds', stage='update_tickets')
+def update_tickets(tickets, event):
+    """
+    Sync the scraped `tickets` of `event` with those stored.
+
+    Existing tickets are loaded in a single query and compared in memory, and
+    only new tickets and those whose availability has changed are written.
+    A transition is recorded for every ticket that becomes available or
+    unavailable. Returns the tickets that were created or changed.
+    """
+    existing = {
+        (ticket.title, ticket.price): ticket
+        for ticket in Ticket.objects.filter(event=event)
+    }
+    scraped = {
+        (ticket.title, ticket.price): ticket.available
+        for ticket in tickets
+    }
+
+    created, changed = [], []
+    for (title, price), available in scraped.items():
+        ticket = existing.get((title, price))
+        if ticket is None:
+            created.append(Ticket(
+                event=event, title=title, price=price, available=available
+            ))
+            continue
+
+        if ticket.ignore is True:
+            # Do not update tickets that have been set to ignore. This allows
             # events to be manually added even if they do not meet the
             # `is_resale_active` criteria of being fully sold out.
             # See Issues #2 and #7.
 
             continue
 
-        ticket_obj.available = ticket['available']
-        yield ticket_obj
+        if ticket.available != available:
+            ticket.available = available
+            changed.append(ticket)
+
+    with transaction.atomic():
+        # Conflicts are ignored in case a concurrent request has created the
+        # same ticket since it was loaded above.
+        Ticket.objects.bulk_create(created, ignore_conflicts=True)
+        Ticket.objects.bulk_update(changed, ['available'])
+
+        flipped = changed
+        if any(ticket.available for ticket in created):
+            # Primary keys are not set by `bulk_create` when ignoring
+            # conflicts so new tickets must be loaded to log them.
+            flipped = flipped + [
+                ticket for ticket in Ticket.objects.filter(
+                    event=event, available=True, ignore=False
+                )
+                if (ticket.title, ticket.price) not in existing
+            ]
+        TicketTransition.objects.bulk_create([
+            TicketTransition(ticket=ticket, available=ticket.available)
+            for ticket in flipped
+        ])
+
+    return created + changed
 
 
 def update_event(page, url):
     event, is_created = Event.objects.get_or_create(
-        title=page['title'],
         url=url,
-        date=page['date'],
+        defaults={'title': page.title, 'date': page.date},
     )
 
-    event.resale_active = page['resale_active']
+    event.title = page.title
+    event.date = page.date
+    event.resale_active = page.resale_active
 
     if not is_created:
         # Ensure that existing events are set to have resale active. This
@@ -174,6 +540,19 @@ def update_event(page, url):
         event.delete()
         raise ResaleInactiveError()
 
+    return event, is_created
+
+
+def refresh_event(event):
+    """
+    Refresh the title and date of `event` from its event page. This is only
+    needed if RA changes the event after it was first tracked.
+    """
+    from . import get_event
+    page = get_event(event.url)
+    event.title = page.title
+    event.date = page.date
+    event.save(update_fields=['title', 'date'])
     return event
 
 
@@ -183,37 +562,152 @@ def update_tracker(email, event, sent):
         event=event
     )
     tracker.sent = sent
+    if not sent:
+        # Arm the tracker again so that it is alerted if tickets are already
+        # available, see `pending_trackers`.
+        tracker.subscribed = timezone.now()
+        tracker.failures = 0
     return tracker
 
 
 @app_engine_cron
 def send(request):
-    tickets = Ticket.objects.filter(available=True, ignore=False)
-    events = list(set(ticket.event for ticket in tickets))
-    trackers = Tracker.objects.filter(event__in=events, sent=False)
+    return outcome_response(request, send_alerts(), describe_delivery)
 
-    for tracker in trackers:
-        try:
-            send_mail(tracker)
-            tracker.sent = True
-            tracker.save()
-        except SMTPException as e:
-            print(f"Failed to send email to {tracker.email}.")
-            print(e)
-            continue
 
-    # reset ticket availability to be updated later
-    for ticket in tickets:
-        ticket.available = False
-        ticket.save()
+def describe_delivery(delivery):
+    tracker, error = delivery
+    described = {'email': tracker.email, 'event': tracker.event.title}
+    if error is not None:
+        described['error'] = repr(error)
+    return described
 
-    return JsonResponse({
-        'response': 'success',
-        'sent': [
-            {'email': tracker.email, 'event': tracker.event.title}
-            for tracker in trackers
+
+def send_alerts(chunk_size=None):
+    """
+    Send pending alerts unless another process already is, see
+    `send_pending`.
+    """
+    with locks.exclusive('send') as locked:
+        if locked:
+            yield from send_pending(chunk_size)
+
+
+def send_pending(chunk_size=None):
+    """
+    Email the trackers of events with tickets released since the last run.
+
+    Trackers are loaded and emailed in chunks of `chunk_size`, paginating on
+    their id, so that memory does not grow with the number of trackers.
+    Yields `('sent' or 'failed', (tracker, error))` pairs once each chunk
+    has been saved.
+
+    Transition ids are allocated before their transaction commits, so a
+    transition below the cursor may only become visible after a run has
+    moved past it. Those logged within `SEND_CURSOR_LAG` seconds of the
+    previous run are read again; trackers that were already sent are not
+    emailed twice.
+    """
+    chunk_size = chunk_size or settings.SEND_CHUNK_SIZE
+    cursor, _ = Cursor.objects.get_or_create(name='send')
+    now = timezone.now()
+    window = Q(id__gt=cursor.position)
+    if cursor.datetime is not None:
+        lag = datetime.timedelta(seconds=settings.SEND_CURSOR_LAG)
+        window |= Q(datetime__gte=cursor.datetime - lag)
+    transitions = TicketTransition.objects.filter(window)
+    position = (
+        TicketTransition.objects.aggregate(position=Max('id'))['position']
+    )
+    if position is not None:
+        transitions = transitions.filter(id__lte=position)
+
+    trackers = (
+        pending_trackers(transitions, since=cursor.datetime).order_by('id')
+    )
+    last = 0
+    while True:
+        chunk = list(trackers.filter(id__gt=last)[:chunk_size])
+        if not chunk:
+            break
+        last = chunk[-1].id
+        messages = [
+            create_message(tracker, tracker.watching) for tracker in chunk
         ]
-    })
+
+        outcomes = []
+        for tracker, (_, error) in zip(chunk, deliver(messages)):
+            if error is not None:
+                print(f"Failed to send email to {tracker.email}.")
+                print(error)
+                tracker.failures += 1
+                outcomes.append(('failed', (tracker, error)))
+                continue
+            print(f"Email sent to {tracker.email}. "
+                  f"Tickets available for {tracker.event.title}.")
+            tracker.sent = True
+            outcomes.append(('sent', (tracker, None)))
+
+        Tracker.objects.bulk_update(chunk, ['sent', 'failures'])
+        yield from outcomes
+
+    # Failed trackers are left unsent and are retried by later runs while
+    # their tickets are available, see `pending_trackers`.
+    cursor.position = position or cursor.position
+    cursor.datetime = now
+    cursor.save()
+
+
+def available_tickets():
+    return Ticket.objects.filter(available=True, ignore=False)
+
+
+def pending_trackers(transitions, since=None):
+    """
+    Unsent trackers to alert, with their event and the number of trackers
+    watching it.
+
+    These are the trackers of events with tickets that became available in
+    `transitions` and are still available, along with trackers subscribed
+    since `since` or whose alert failed fewer than `SEND_ATTEMPTS` times for
+    events that already had available tickets. All trackers of events with
+    available tickets are included if `since` is None.
+    """
+    released = (
+        transitions
+        .filter(available=True, ticket__available=True, ticket__ignore=False)
+        .values('ticket__event')
+    )
+    available = Q(event__in=available_tickets().values('event'))
+    subscribed = available
+    if since is not None:
+        subscribed &= Q(subscribed__gte=since)
+    retrying = available & Q(
+        failures__gt=0, failures__lt=settings.SEND_ATTEMPTS
+    )
+
+    return (
+        Tracker.objects
+        .filter(Q(event__in=released) | subscribed | retrying, sent=False)
+        .select_related('event')
+        .annotate(watching=count_watching())
+    )
+
+
+def count_watching():
+    """
+    Subquery counting the trackers watching the same event page as the
+    tracker in the outer query.
+    """
+    watching = (
+        Tracker.objects
+        .filter(event__url=OuterRef('event__url'))
+        .order_by()
+        .values('event__url')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return Subquery(watching, output_field=IntegerField())
 
 
 def create_email_body(url, title, others):
@@ -225,34 +719,136 @@ def create_email_body(url, title, others):
             f"event.")
 
 
-def send_mail(tracker):
+def create_confirmation_message(tracker):
+    title = tracker.event.title
+    url = tracker.event.url
+    msg = (f"You will receive an email when tickets become available for "
+           f"<a href='{url}'>{title}</a>.")
+    message = mail.EmailMultiAlternatives(
+        subject=f"Alert set up for {title}.",
+        body=f"Alert set up for {title}.",
+        from_email='resale.alerts@gmail.com',
+        to=[tracker.email],
+    )
+    message.attach_alternative(msg, 'text/html')
+    return message
+
+
+def create_failure_message(submission):
+    url = submission.url
+    reason = FAILURE_MESSAGES[submission.reason]
+    msg = (f"We could not set up an alert for <a href='{url}'>{url}</a>. "
+           f"{reason}")
+    message = mail.EmailMultiAlternatives(
+        subject="Could not set up your alert.",
+        body=f"Could not set up an alert for {url}. {reason}",
+        from_email='resale.alerts@gmail.com',
+        to=[submission.email],
+    )
+    message.attach_alternative(msg, 'text/html')
+    return message
+
+
+def create_message(tracker, watching=None):
     title = tracker.event.title
     url = tracker.event.url
     email = tracker.email
-    watching = Tracker.objects.filter(event__url=url).count()
+    if watching is None:
+        watching = Tracker.objects.filter(event__url=url).count()
     msg = create_email_body(url, title, others=watching - 1)
-    mail.send_mail(
+    message = mail.EmailMultiAlternatives(
         subject=f"Tickets available for {title}.",
-        message=f"Tickets available for {title}.",
-        html_message=msg,
+        body=f"Tickets available for {title}.",
         from_email='resale.alerts@gmail.com',
-        recipient_list=[email],
-        fail_silently=False,
+        to=[email],
     )
-    print(f"Email sent to {email}. Tickets available for {title}.")
+    message.attach_alternative(msg, 'text/html')
+    return message
 
 
 @app_engine_cron
 def prune(request):
-    expiry = datetime.date.today() - datetime.timedelta(days=5)
-    expired_events = Event.objects.filter(date__lte=expiry)
-    expired_trackers = Tracker.objects.filter(event__in=expired_events)
-    for tracker in expired_trackers:
-        tracker.delete()
     return JsonResponse({
         'response': 'success',
-        'pruned': [
-            {'email': tracker.email, 'event': tracker.event.title}
-            for tracker in expired_trackers
-        ]
+        'pruned': prune_expired()
     })
+
+
+def prune_expired(days=5):
+    """
+    Delete events that happened more than `days` ago and old submissions,
+    unless another process already is.
+    """
+    with locks.exclusive('prune') as locked:
+        if not locked:
+            # Another process is pruning.
+            return {}
+        expiry = datetime.date.today() - datetime.timedelta(days=days)
+        pruned = prune_events(expiry)
+        pruned['submissions'] = prune_submissions(expiry)
+        return pruned
+
+
+def prune_submissions(expiry):
+    """
+    Delete processed form submissions made on or before `expiry`.
+    """
+    deleted, _ = (
+        Submission.objects
+        .filter(datetime__date__lte=expiry)
+        .exclude(status=Submission.PENDING)
+        .delete()
+    )
+    return deleted
+
+
+@metrics.timed('prune_seconds', stage='prune')
+def prune_events(expiry, chunk_size=None):
+    """
+    Delete events on or before `expiry` along with their tickets and trackers.
+
+    Events are deleted in chunks, each in its own short transaction, so that
+    a large backlog is never locked for long. Returns the number of rows
+    deleted from each table.
+    """
+    chunk_size = chunk_size or settings.PRUNE_CHUNK_SIZE
+    expired = Event.objects.filter(date__lte=expiry).order_by('id')
+    models = {'events': Event, 'tickets': Ticket, 'trackers': Tracker}
+    counts = dict.fromkeys(models, 0)
+
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            break
+        # Tickets and trackers are removed by the cascade with one DELETE
+        # per table for the whole chunk.
+        _, deleted = Event.objects.filter(id__in=ids).delete()
+        for name, model in models.items():
+            counts[name] += deleted.get(model._meta.label, 0)
+
+    return counts
+
+
+def warmup(request):
+    """
+    Load the scraper when App Engine warms up a new instance so that the
+    first request to scrape does not wait for it.
+    """
+    from . import warmup as load_scraper
+    load_scraper()
+    return HttpResponse('')
+
+
+def export_metrics(request):
+    """
+    Export metrics in the Prometheus text format to requests bearing
+    `METRICS_TOKEN`.
+    """
+    token = settings.METRICS_TOKEN
+    supplied = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (metrics.enabled() and token and
+            hmac.compare_digest(supplied, f'Bearer {token}')):
+        raise Http404('Metrics not available.')
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
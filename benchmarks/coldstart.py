@@ -0,0 +1,85 @@
+"""
+Measure the cold start of the WSGI app in `resale/wsgi.py`.
+
+Each run starts a fresh interpreter, imports the app and serves a single
+request to it, and reports the time to import the app, the time to the
+first response and whether the scraper was loaded. The median of the runs
+is reported for each path, with and without `SCRAPER_WARMUP`.
+
+    $ python -m benchmarks.coldstart --paths /privacy / --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child interpreter with the path to request as its argument.
+CHILD = """
+import io
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+from resale.wsgi import application
+imported = time.perf_counter()
+
+environ = {'PATH_INFO': sys.argv[1], 'wsgi.errors': io.StringIO()}
+setup_testing_defaults(environ)
+statuses = []
+body = b''.join(application(
+    environ, lambda status, headers: statuses.append(status)
+))
+responded = time.perf_counter()
+
+print(json.dumps({
+    'import': imported - start,
+    'response': responded - start,
+    'status': statuses[0],
+    'scraper': 'alerts.scraper' in sys.modules,
+    'requests': 'requests' in sys.modules,
+    'lxml': 'lxml.etree' in sys.modules,
+}))
+"""
+
+
+def cold_start(path, warmup):
+    env = dict(os.environ)
+    env.setdefault('PROJECT_SECRET', 'benchmark')
+    env.pop('GAE_APPLICATION', None)
+    env['SCRAPER_WARMUP'] = '1' if warmup else ''
+    output = subprocess.run(
+        [sys.executable, '-c', 'import json\n' + CHILD, path],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--paths', nargs='+', default=['/privacy', '/'])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    for path in args.paths:
+        for warmup in (False, True):
+            runs = [cold_start(path, warmup) for _ in range(args.runs)]
+            imported = statistics.median(run['import'] for run in runs)
+            responded = statistics.median(run['response'] for run in runs)
+            loaded = [
+                name for name in ('scraper', 'requests', 'lxml')
+                if runs[-1][name]
+            ]
+            name = f"{path}{' (warmup)' if warmup else ''}"
+            print(f"{name:<20} {runs[-1]['status']:<8} "
+                  f"import {imported * 1000:7.1f} ms  "
+                  f"first response {responded * 1000:7.1f} ms  "
+                  f"loaded: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Helpers to run benchmarks against a seeded, throwaway database.
+"""
+import datetime
+import os
+
+import django
+
+
+def setup():
+    """
+    Configure Django and create an empty test database. Returns the name of
+    the configured database, to be passed to `teardown`.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'resale.settings')
+    os.environ.setdefault('PROJECT_SECRET', 'benchmark')
+    django.setup()
+
+    from django.db import connection
+    name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    return name
+
+
+def teardown(name):
+    from django.db import connection
+    connection.creation.destroy_test_db(name, verbosity=0)
+
+
+def seed(events, tickets=4, trackers=3, available=0.1, expired=0.1):
+    """
+    Insert `events` events with `tickets` tickets and `trackers` trackers
+    each. A fraction `available` of events have an available ticket and a
+    fraction `expired` took place in the past.
+    """
+    from django.db import connection
+    from alerts.models import Event, Ticket, Tracker
+
+    today = datetime.date.today()
+    every_available = round(1 / available) if available else 0
+    every_expired = round(1 / expired) if expired else 0
+
+    objects = []
+    for i in range(events):
+        if every_expired and i % every_expired == 0:
+            date = today - datetime.timedelta(days=30 + i % 60)
+        else:
+            date = today + datetime.timedelta(days=1 + i % 120)
+        objects.append(Event(
+            title=f"Event {i}",
+            url=f"https://ra.co/events/{1000000 + i}",
+            date=date,
+            resale_active=True,
+        ))
+    objects = Event.objects.bulk_create(objects, batch_size=500)
+    if objects[0].pk is None:
+        objects = list(Event.objects.order_by('id'))
+
+    Ticket.objects.bulk_create([
+        Ticket(
+            event=event,
+            title=f"Release {j}",
+            price=f"£{10 + j}.00",
+            available=bool(
+                every_available and i % every_available == 0 and j == 0
+            ),
+        )
+        for i, event in enumerate(objects)
+        for j in range(tickets)
+    ], batch_size=500)
+
+    Tracker.objects.bulk_create([
+        Tracker(event=event, email=f"user{j}@example.com", sent=j == 0)
+        for event in objects
+        for j in range(trackers)
+    ], batch_size=500)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return objects
@@ -0,0 +1,97 @@
+"""
+Print the query plan of each cron query on a seeded database.
+
+Queries that scan a whole table rather than searching an index are flagged.
+
+    $ python -m benchmarks.explain --events 10000
+"""
+import argparse
+import datetime
+import re
+
+from benchmarks import database
+
+
+def queries(event):
+    from django.conf import settings
+    from django.db.models import Count, Q
+    from django.utils import timezone
+    from alerts import views
+    from alerts.models import Event, Ticket, TicketTransition, Tracker
+
+    expiry = datetime.date.today() - datetime.timedelta(days=5)
+    due = views.due_events()
+    claimed = list(due.values_list('id', flat=True)[:settings.POLL_BUDGET])
+    return {
+        'update: due events': due,
+        'update: due events in a shard': views.due_events(shard=1, shards=4),
+        'update: claim due events': (
+            due
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:settings.POLL_BUDGET]
+        ),
+        'update: claimed events': (
+            Event.objects
+            .filter(id__in=claimed, lease_owner='benchmark')
+            .annotate(watching=Count('tracker', filter=Q(tracker__sent=False)))
+        ),
+        'update: stored tickets': Ticket.objects.filter(event=event),
+        'send: pending trackers': views.pending_trackers(
+            TicketTransition.objects.filter(
+                Q(id__gt=0) |
+                Q(datetime__gte=timezone.now() - datetime.timedelta(
+                    seconds=settings.SEND_CURSOR_LAG
+                ))
+            ),
+            since=timezone.now()
+        ),
+        'add_tracker: event by url': Event.objects.filter(url=event.url),
+        'add_tracker: tracker by email': Tracker.objects.filter(
+            event=event, email='user1@example.com'
+        ),
+        'prune: expired events': (
+            Event.objects
+            .filter(date__lte=expiry)
+            .order_by('id')
+            .values_list('id', flat=True)[:settings.PRUNE_CHUNK_SIZE]
+        ),
+    }
+
+
+def full_scans(plan):
+    """
+    Tables scanned in full by `plan`, from SQLite's `SCAN table` and
+    PostgreSQL's `Seq Scan on table`.
+    """
+    sqlite = re.findall(r'\bSCAN (\w+)(?! USING)(?:\s|$)', plan)
+    postgresql = re.findall(r'Seq Scan on (\w+)', plan)
+    return sorted(set(sqlite + postgresql))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=10000)
+    args = parser.parse_args()
+
+    name = database.setup()
+    try:
+        from django.db import transaction
+
+        events = database.seed(args.events)
+        # Locking queries can only be run in a transaction.
+        with transaction.atomic():
+            for title, queryset in queries(events[len(events) // 2]).items():
+                print(f"-- {title}")
+                print(str(queryset.query))
+                plan = queryset.explain()
+                print(plan)
+                scans = full_scans(plan)
+                if scans:
+                    print(f"!! full scan of {', '.join(scans)}")
+                print()
+    finally:
+        database.teardown(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark of event page and ticket widget parsing.
+
+Parses the saved RA documents in `benchmarks/fixtures` repeatedly and reports
+throughput and the peak memory allocated per document so that extraction
+performance can be tracked over time. `event_next.html` embeds its data as
+JSON like current RA pages and `event.html` does not, so falls back to the
+HTML. Only Python allocations are traced, so memory used by libxml2 for
+the DOM is not included in the figures for HTML parsing.
+
+    $ python -m benchmarks.parse --number 2000
+"""
+import argparse
+import os
+import timeit
+import tracemalloc
+
+import django
+
+from alerts import parse_event, parse_event_html, parse_tickets
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def peak_allocated(fn, document):
+    tracemalloc.start()
+    try:
+        fn(document)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(name, fn, document, number, repeat):
+    timings = timeit.repeat(
+        lambda: fn(document), number=number, repeat=repeat
+    )
+    best = min(timings) / number
+    peak = peak_allocated(fn, document)
+    print(f"{name:<30} {best * 1e6:10.1f} us/doc {1 / best:10.0f} docs/s "
+          f"{peak / 1024:8.1f} KiB peak (Python)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--number', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Settings are needed to check whether metrics are enabled.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'resale.settings')
+    os.environ.setdefault('PROJECT_SECRET', 'benchmark')
+    django.setup()
+
+    runs = [
+        ('parse_event (embedded)', parse_event, 'event_next.html'),
+        ('parse_event_html (embedded)', parse_event_html, 'event_next.html'),
+        ('parse_event (fallback)', parse_event, 'event.html'),
+        ('parse_tickets', parse_tickets, 'embedtickets.html'),
+    ]
+    for name, fn, fixture in runs:
+        benchmark(name, fn, load_fixture(fixture), args.number, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark the update, send and prune cron views against a local RA stand-in.
+
+Seeds a throwaway database with events, tickets and trackers, serves their
+pages from a stub HTTP server and captures email in memory. Reports wall
+time, database queries, requests per second and the peak memory allocated
+by each view. Memory is measured in a second pass over a freshly seeded
+database as tracing allocations slows the threaded views down.
+
+The rate limiter is lifted unless `--rate` is given so that the pipeline
+rather than the limit is measured.
+
+    $ python -m benchmarks.pipeline --events 100 1000 10000 --latency 0.05
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+
+from benchmarks import database
+from benchmarks.stub import StubAdapter, StubServer
+
+
+def call(view, path):
+    from django.test import RequestFactory
+
+    request = RequestFactory().get(path, HTTP_X_APPENGINE_CRON='true')
+    response = view(request)
+    if getattr(response, 'streaming', False):
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def measure(name, view, server):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    requests = server.requests
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries, \
+            contextlib.redirect_stdout(io.StringIO()):
+        call(view, f'/{name}')
+    elapsed = time.perf_counter() - start
+    requests = server.requests - requests
+    return elapsed, len(queries), requests / elapsed
+
+
+def measure_memory(name, view):
+    """
+    Peak memory allocated while `view` runs, in bytes.
+    """
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        call(view, f'/{name}')
+    return tracemalloc.get_traced_memory()[1] - start
+
+
+def seed(events):
+    from django.core import mail
+    from alerts.models import Event
+
+    Event.objects.all().delete()
+    mail.outbox = []
+    database.seed(events, trackers=3, expired=0.1)
+
+
+def run(events, server):
+    from django.core import mail
+    from alerts import views
+
+    cron = [
+        ('update', views.update), ('send', views.send), ('prune', views.prune)
+    ]
+
+    seed(events)
+    throttled = server.throttled
+    timings = {name: measure(name, view, server) for name, view in cron}
+    emails = len(mail.outbox)
+    throttled = server.throttled - throttled
+
+    seed(events)
+    tracemalloc.start()
+    try:
+        peaks = {name: measure_memory(name, view) for name, view in cron}
+    finally:
+        tracemalloc.stop()
+
+    print(f"-- {events} events")
+    for name, _ in cron:
+        elapsed, queries, rate = timings[name]
+        print(f"{name:<8} {elapsed:9.2f} s {queries:9d} queries "
+              f"{rate:9.1f} req/s {peaks[name] / 2 ** 20:9.1f} MiB peak")
+    print(f"{'':<8} {emails} emails sent, {throttled} requests throttled")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, nargs='+',
+                        default=[100, 1000, 10000])
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="Seconds before the stub responds.")
+    parser.add_argument('--failures', type=float, default=0.0,
+                        help="Fraction of stub requests that fail.")
+    parser.add_argument('--available', type=float, default=0.05,
+                        help="Fraction of ticket widgets with a release.")
+    parser.add_argument('--throttle', type=float, default=None,
+                        help="Requests per second before the stub 429s.")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Limit on requests per second to the stub.")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help="Limit on requests in flight to the stub.")
+    args = parser.parse_args()
+
+    name = database.setup()
+    from django.conf import settings
+    from alerts import client
+
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    settings.POLL_BUDGET = max(args.events)
+    settings.RA_RATE = args.rate or 1e9
+    settings.RA_BURST = settings.RA_RATE if args.rate else 1e9
+    settings.RA_CONCURRENCY = args.concurrency or settings.RA_POLL_WORKERS
+    # The cron views only respond on App Engine. This is set after settings
+    # are loaded so that the local database is still used.
+    os.environ['GAE_APPLICATION'] = 'benchmark'
+
+    server = StubServer(
+        args.latency, args.failures, args.available, args.throttle
+    ).start()
+    session = client.get_session()
+    adapter = session.get_adapter('https://ra.co')
+    session.mount('https://', StubAdapter(
+        server.url,
+        pool_maxsize=settings.RA_POOL_SIZE,
+        max_retries=adapter.max_retries,
+    ))
+
+    try:
+        for events in args.events:
+            run(events, server)
+    finally:
+        server.stop()
+        database.teardown(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Local stand-in for ra.co serving synthetic event pages and ticket widgets.
+"""
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from requests.adapters import HTTPAdapter
+
+EVENT_PATH = re.compile(r'^/events/(\d+)$')
+TICKETS_PATH = re.compile(r'^/widget/event/(\d+)/embedtickets$')
+
+EVENT = """<!DOCTYPE html>
+<html><body>
+<h1><span>Event {id}</span></h1>
+<ul><li><div><span>Date</span></div><div><a>Sat, 20 Mar 2099</a></div></li></ul>
+</body></html>
+"""
+TICKETS = """<!DOCTYPE html>
+<html><body><ul><li id="ticket-types"><ul>
+<li class="closed"><div class="type-title">Release 0</div><div class="type-price">£10.00</div></li>
+<li class="closed"><div class="type-title">Release 1</div><div class="type-price">£11.00</div></li>
+<li class="{availability}"><div class="type-title">Release 2</div><div class="type-price">£12.00</div></li>
+<li class="closed"><div class="type-title">Release 3</div><div class="type-price">£13.00</div></li>
+</ul></li></ul></body></html>
+"""
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Serves RA pages after `latency` seconds, failing a fraction `failures` of
+    requests with a 503 and releasing a ticket on a fraction `available` of
+    ticket widgets. If `throttle` is set, requests beyond that many per
+    second are refused with a 429 like RA does.
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, failures=0.0, available=0.05,
+                 throttle=None):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.latency = latency
+        self.failures = failures
+        self.available = available
+        self.throttle = throttle
+        self.requests = 0
+        self.throttled = 0
+        self._window = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self):
+        """
+        Count a request and return whether it is over the throttle.
+        """
+        with self._lock:
+            self.requests += 1
+            if not self.throttle:
+                return False
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1]
+            if len(self._window) >= self.throttle:
+                self.throttled += 1
+                return True
+            self._window.append(now)
+            return False
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in a single packet to avoid delayed ACKs.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        if server.count():
+            return self.respond(429, '', {'Retry-After': '1'})
+        time.sleep(server.latency)
+
+        if random.random() < server.failures:
+            return self.respond(503, '')
+
+        match = TICKETS_PATH.match(self.path)
+        if match:
+            available = random.random() < server.available
+            availability = 'onsale but' if available else 'closed'
+            return self.respond(200, TICKETS.format(availability=availability))
+
+        match = EVENT_PATH.match(self.path)
+        if match:
+            return self.respond(200, EVENT.format(id=match[1]))
+
+        return self.respond(404, '')
+
+    def respond(self, status, body, headers=None):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubAdapter(HTTPAdapter):
+    """
+    Transport adapter that sends requests for ra.co to a `StubServer`.
+    """
+    def __init__(self, url, **kwargs):
+        self.stub_url = url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = re.sub(r'^https?://(?:www\.)?ra\.co', self.stub_url,
+                             request.url)
+        return super().send(request, **kwargs)
@@ -35,7 +35,7 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
-    'alerts',
+    'alerts.apps.AlertsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'alerts.metrics.QueryCountMiddleware',
 ]
 
 ROOT_URLCONF = 'resale.urls'
@@ -108,6 +109,35 @@ else:
     }
 
 
+# Caches
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+#
+# The `pages` cache holds scraped event pages. It must be shared between
+# gunicorn workers and instances for fetches to be coalesced across them, so
+# it defaults to the database cache, whose table is created with
+# `python manage.py createcachetable`. Memcached can be used instead.
+
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 60))
+PAGE_CACHE_LOCK_TIMEOUT = int(os.environ.get('PAGE_CACHE_LOCK_TIMEOUT', 30))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pages': {
+        'BACKEND': os.environ.get(
+            'PAGE_CACHE_BACKEND',
+            'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': os.environ.get('PAGE_CACHE_LOCATION', 'page_cache'),
+        'TIMEOUT': PAGE_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -156,3 +186,83 @@ EMAIL_HOST = os.environ.get("EMAIL_HOST", '')
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", '')
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", '')
 EMAIL_PORT = 587
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 50))
+EMAIL_SENDERS = int(os.environ.get('EMAIL_SENDERS', 2))
+
+
+# Scraping configuration
+
+RA_POLL_WORKERS = int(os.environ.get('RA_POLL_WORKERS', 8))
+RA_POOL_SIZE = int(os.environ.get('RA_POOL_SIZE', RA_POLL_WORKERS))
+RA_RETRIES = int(os.environ.get('RA_RETRIES', 2))
+RA_RETRY_BACKOFF = float(os.environ.get('RA_RETRY_BACKOFF', 0.5))
+# Requests per second to RA across all threads. The rate is lowered down to
+# RA_MIN_RATE while RA is throttling and climbs back to RA_RATE.
+RA_RATE = float(os.environ.get('RA_RATE', 20))
+RA_MIN_RATE = float(os.environ.get('RA_MIN_RATE', 0.5))
+RA_BURST = int(os.environ.get('RA_BURST', 10))
+RA_CONCURRENCY = int(os.environ.get('RA_CONCURRENCY', RA_POLL_WORKERS))
+# Requests to RA fail fast for RA_BREAKER_COOLDOWN seconds once at least
+# RA_BREAKER_THRESHOLD of the last RA_BREAKER_VOLUME or more requests within
+# RA_BREAKER_WINDOW seconds have failed or taken over RA_BREAKER_SLOW seconds.
+RA_BREAKER_THRESHOLD = float(os.environ.get('RA_BREAKER_THRESHOLD', 0.5))
+RA_BREAKER_VOLUME = int(os.environ.get('RA_BREAKER_VOLUME', 10))
+RA_BREAKER_WINDOW = float(os.environ.get('RA_BREAKER_WINDOW', 60))
+RA_BREAKER_SLOW = float(os.environ.get('RA_BREAKER_SLOW', 5))
+RA_BREAKER_COOLDOWN = float(os.environ.get('RA_BREAKER_COOLDOWN', 30))
+
+# Set RA_TRANSPORT to `record` to save every response from RA to the archive
+# at RA_ARCHIVE, or to `replay` to answer requests from it without using the
+# network. Replayed responses take their recorded time divided by
+# RA_REPLAY_SPEED, or none at all if it is 0.
+RA_TRANSPORT = os.environ.get('RA_TRANSPORT', '')
+RA_ARCHIVE = os.environ.get('RA_ARCHIVE', 'ra-responses.jsonl.gz')
+RA_REPLAY_SPEED = float(os.environ.get('RA_REPLAY_SPEED', 1))
+RA_REPLAY_CONCURRENCY = int(
+    os.environ.get('RA_REPLAY_CONCURRENCY', RA_CONCURRENCY)
+)
+
+# Maximum number of events polled per `update` run, and the minimum number
+# of minutes between polls of the same event.
+POLL_BUDGET = int(os.environ.get('POLL_BUDGET', 500))
+POLL_MIN_INTERVAL = float(os.environ.get('POLL_MIN_INTERVAL', 5))
+# Seconds an event stays leased to the worker polling it. This should be
+# longer than an `update` run.
+POLL_LEASE_SECONDS = int(os.environ.get('POLL_LEASE_SECONDS', 600))
+# Number of rows the cron views hold in memory between database writes.
+POLL_WRITE_CHUNK_SIZE = int(os.environ.get('POLL_WRITE_CHUNK_SIZE', 100))
+SEND_CHUNK_SIZE = int(os.environ.get('SEND_CHUNK_SIZE', 500))
+# Trackers whose alert could not be delivered are retried on later `send`
+# runs until SEND_ATTEMPTS have failed. Each run also re-reads transitions
+# logged up to SEND_CURSOR_LAG seconds before the previous run, in case they
+# committed after it.
+SEND_ATTEMPTS = int(os.environ.get('SEND_ATTEMPTS', 5))
+SEND_CURSOR_LAG = int(os.environ.get('SEND_CURSOR_LAG', 120))
+
+# Maximum number of form submissions scraped per `submissions` run, and the
+# number of attempts before a submission that keeps timing out fails.
+SUBMISSION_BUDGET = int(os.environ.get('SUBMISSION_BUDGET', 50))
+SUBMISSION_ATTEMPTS = int(os.environ.get('SUBMISSION_ATTEMPTS', 3))
+
+PRUNE_CHUNK_SIZE = int(os.environ.get('PRUNE_CHUNK_SIZE', 500))
+
+# Seconds the `poll` worker waits between runs and between prunes. The
+# worker reports itself unhealthy if no run has completed for
+# WORKER_HEALTH_TIMEOUT seconds.
+WORKER_INTERVAL = float(os.environ.get('WORKER_INTERVAL', 30))
+WORKER_PRUNE_INTERVAL = float(os.environ.get('WORKER_PRUNE_INTERVAL', 3600))
+WORKER_HEALTH_TIMEOUT = float(
+    os.environ.get('WORKER_HEALTH_TIMEOUT', POLL_LEASE_SECONDS)
+)
+
+
+# The scraper is loaded on first use unless SCRAPER_WARMUP is set, in which
+# case it is loaded when Django starts.
+
+SCRAPER_WARMUP = bool(os.environ.get('SCRAPER_WARMUP', ''))
+
+
+# Metrics are recorded and exported at /metrics only when a token is set.
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ENABLED = bool(METRICS_TOKEN)
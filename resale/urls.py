@@ -6,10 +6,13 @@ from alerts import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.index, name='index'),
+    path('submissions', views.submissions, name='submissions'),
     path('update', views.update, name='update'),
     path('send', views.send, name='send'),
     path('success', views.success, name='success'),
     path('failure', views.failure, name='failure'),
     path('privacy', views.privacy, name='privacy'),
-    path('prune', views.prune, name='prune')
+    path('prune', views.prune, name='prune'),
+    path('metrics', views.export_metrics, name='metrics'),
+    path('_ah/warmup', views.warmup, name='warmup')
 ]